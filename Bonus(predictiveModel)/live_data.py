@@ -1,35 +1,24 @@
-import requests
-import pandas as pd
+import os
+import sys
 
-def get_potion_levels():
+# Shared loaders live at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import api_loader
+
+def get_potion_levels(start=None, end=None):
     """
-    Gets full historical potion level data from the API and returns
-      it as a wide-format pandas DataFrame:
+    Gets historical potion level data and returns it as a wide-format
+      pandas DataFrame:
       index: timestamp (datetime)
       columns: cauldron IDs
-      values: potion levels at each timestamp
-    """
-    url = "https://hackutd2025.eog.systems/api/Data/?start_date=0&end_date=2000000000"
-    response = requests.get(url)
-    response.raise_for_status()
-    json_data = response.json()
-
-    # Flatten JSON into rows for DataFrame
-    records = []
-    for entry in json_data:
-        ts = entry['timestamp']
-        for cauldron_id, level in entry['cauldron_levels'].items():
-            records.append({
-                "timestamp": ts,
-                "cauldron_id": cauldron_id,
-                "level": level
-            })
+      values: potion levels at each timestamp (float32)
 
-    # Create DataFrame
-    df = pd.DataFrame(records)
-
-    # Convert timestamp to datetime and pivot to wide
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df_wide = df.pivot(index='timestamp', columns='cauldron_id', values='level')
-
-    return df_wide
+    Without `start` this is the shared level matrix from api_loader (the
+    snapshot the server keeps, plus whatever is newer), so the full
+    history isn't downloaded again. With a range (Unix seconds, dates or
+    datetimes; `end` defaults to now) just that range is fetched, in
+    parallel day-sized windows.
+    """
+    if start is not None:
+        return api_loader.levels_to_matrix(api_loader.fetch_cauldron_levels_range(start, end))
+    return api_loader.get_level_matrix()
@@ -1,32 +1,27 @@
-import requests
+import os
+import sys
 import pandas as pd
 import networkx as nx
+from concurrent.futures import ThreadPoolExecutor
 
-BASE = "https://hackutd2025.eog.systems"
+# Shared HTTP client (pooled session, gzip, retries, ETag caching) lives at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import api_client
 
 def fetch_network_edges() -> list[dict]:
     """GET /api/Information/network -> [{'from','to','travel_time_minutes'}, ...]"""
-    url = f"{BASE}/api/Information/network"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    data = r.json()
+    data = api_client.get_json("Information/network", conditional=True)
     # Some APIs return {"edges":[...]} vs a bare list; normalize:
     edges = data["edges"] if isinstance(data, dict) and "edges" in data else data
     return edges
 
 def fetch_cauldrons() -> pd.DataFrame:
     """GET /api/Information/cauldrons -> id, name, lat, lon, max_volume (for reference)"""
-    url = f"{BASE}/api/Information/cauldrons"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    return pd.DataFrame(r.json())
+    return pd.DataFrame(api_client.get_json("Information/cauldrons", conditional=True))
 
 def fetch_market() -> dict:
     """GET /api/Information/market -> depot node info (id, name, lat, lon)"""
-    url = f"{BASE}/api/Information/market"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return api_client.get_json("Information/market", conditional=True)
 
 def build_graph(edges: list[dict], directed: bool = True) -> nx.Graph:
     """
@@ -75,9 +70,14 @@ def compute_travel_times(directed: bool = True) -> tuple[pd.DataFrame, pd.DataFr
       - compute all-pairs travel-time matrix (minutes)
     Returns: (matrix_df, cauldrons_df, market_dict)
     """
-    edges = fetch_network_edges()
-    cauldrons = fetch_cauldrons()
-    market = fetch_market()
+    # The three requests are independent, so issue them together
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        edges_future = pool.submit(fetch_network_edges)
+        cauldrons_future = pool.submit(fetch_cauldrons)
+        market_future = pool.submit(fetch_market)
+        edges = edges_future.result()
+        cauldrons = cauldrons_future.result()
+        market = market_future.result()
 
     # Build graph and ensure market + cauldrons appear as nodes (even if isolated)
     G = build_graph(edges, directed=directed)
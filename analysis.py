@@ -1,103 +1,389 @@
 import pandas as pd
 import numpy as np
 import api_loader
+import level_store
+import fill_rate_sketch
+import result_encoder
 from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware # or other middleware
-from pydantic import BaseModel
+import anyio
+from pydantic import BaseModel, Field
+from typing import Literal
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+import bisect
 import datetime
+import os
 
-def get_baseline_fill_rate(cauldron_data: pd.DataFrame) -> float:
+# --- Analysis parameters ---
+
+# A "Fast Drain" is any minute the cauldron level drops noticably
+FAST_DRAIN_THRESHOLD = -0.25
+
+# Setting a minimum to filter out small fluctuations
+MINIMUM_TICKET_THRESHOLD = 15.0
+
+# We can keep a 5% tolerance between events and tickets for matching
+MATCH_TOLERANCE = 0.05
+
+def compute_fill_rates(df: pd.DataFrame) -> pd.Series:
     """
-    Calculates the baseline fill rate by finding the 90th percentile
-    of all positive, minute-by-minute deltas.
+    The baseline fill rate of every cauldron, as a side table
+    (cauldron_id -> L/min) instead of a column repeated on every row.
+
+    The baseline is the median of each cauldron's positive minute-by-minute
+    deltas, taken from the 'observed_delta' column (so `df` must be sorted
+    by time) in one grouped pass over all cauldrons.
     """
-    delta = cauldron_data.sort_values(by='timestamp')['volume'].diff()
-    
-    # Filter for only positive deltas (when it's filling)
-    positive_deltas = delta[delta > 0]
-    
-    if positive_deltas.empty:
-        return 0
-    
-    # Use quantile(0.9) to find the "true" undisturbed fill rate.
-    # This ignores the median, which might be polluted by slow drains.
-    baseline_fill_rate = positive_deltas.median()
-    return baseline_fill_rate
+    # Filter for only positive deltas (when it's filling).
+    # The median ignores the slow drains that would pollute a mean.
+    delta = df['observed_delta']
+    positive_deltas = delta.where(delta > 0)
+    fill_rates = positive_deltas.groupby(df['cauldron_id'], observed=True).median()
+
+    # A cauldron that never fills has a baseline of 0
+    fill_rates = fill_rates.fillna(0).astype(np.float64)
+    fill_rates.index = fill_rates.index.astype(str)
+    return fill_rates.rename('fill_rate').rename_axis('cauldron_id')
 
-def add_analysis_columns(df: pd.DataFrame) -> pd.DataFrame:
+def fill_rate_per_row(df: pd.DataFrame, fill_rates) -> np.ndarray:
     """
-    Adds 'fill_rate' and 'observed_delta' columns.
+    Looks up each row's fill rate (float64): from the per-cauldron side
+    table, or from a day x cauldron grid of time-varying rates (see
+    fill_rate_sketch.rolling_fill_rates).
     """
-    print("Adding analysis columns (fill_rate, observed_delta)...")
-    
-    fill_rate_map = {}
-    for cauldron_id, data in df.groupby('cauldron_id'):
-        fill_rate_map[cauldron_id] = get_baseline_fill_rate(data)
+    codes = df['cauldron_id'].cat.codes.to_numpy()
+    if isinstance(fill_rates, pd.DataFrame):
+        grid = fill_rates.reindex(columns=df['cauldron_id'].cat.categories).to_numpy(dtype=np.float64)
+        rows = fill_rate_sketch.day_numbers(df['timestamp']) - fill_rates.index[0]
+        return grid[rows, codes]
+    rates = fill_rates.reindex(df['cauldron_id'].cat.categories).to_numpy(dtype=np.float64)
+    return rates[codes]
 
-    df['fill_rate'] = df['cauldron_id'].map(fill_rate_map)
+def add_analysis_columns(df: pd.DataFrame) -> tuple:
+    """
+    Adds the 'observed_delta' column and computes the fill rates.
+    Returns (df, fill_rates).
+    """
+    print("Adding analysis columns (fill_rate, observed_delta)...")
     
     # Calculate and store the raw, observed change
-    df['observed_delta'] = df.groupby('cauldron_id')['volume'].diff().fillna(0)
+    df['observed_delta'] = df.groupby('cauldron_id', observed=True)['volume'].diff().fillna(0)
+    
+    fill_rates = compute_fill_rates(df)
     
     print("Analysis columns added.")
-    return df
+    return df, fill_rates
+
+def extend_analysis_columns(df: pd.DataFrame, new_df: pd.DataFrame, previous_rows: pd.DataFrame) -> tuple:
+    """
+    Appends newly fetched readings to an analyzed DataFrame, computing
+    'observed_delta' only for the new rows, and recomputes the fill rates
+    over the whole history (as a fresh load would). `previous_rows` should
+    hold the latest reading of every cauldron (e.g. the last day of `df`).
+    Returns (df, fill_rates).
+    """
+    previous = previous_rows.groupby('cauldron_id', observed=True).tail(1)
+    new_ids = set(new_df['cauldron_id'].unique())
+    if not new_ids <= set(previous['cauldron_id']):
+        # Some cauldron didn't report recently, look through everything
+        previous = df.groupby('cauldron_id', observed=True).tail(1)
+
+    # Deltas continue from each cauldron's previous reading
+    tail = pd.concat([previous[['cauldron_id', 'volume']], new_df[['cauldron_id', 'volume']]], ignore_index=True)
+    observed_delta = tail.groupby('cauldron_id', observed=True)['volume'].diff().fillna(0).iloc[len(previous):]
+
+    new_df = new_df.assign(observed_delta=observed_delta.to_numpy())
+    df = api_loader.append_cauldron_levels(df, new_df)
+
+    # The new readings move the medians too (one grouped pass, see compute_fill_rates)
+    return df, compute_fill_rates(df)
+
+def day_numbers(timestamps: pd.Series) -> np.ndarray:
+    """
+    Calendar day of each timestamp as a day number (days since the epoch,
+    counted in the timestamps' own time zone).
+    """
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)  # wall-clock time
+    return timestamps.dt.as_unit("ns").array.asi8 // fill_rate_sketch.NS_PER_DAY
+
+def build_day_index(df: pd.DataFrame, column: str) -> dict:
+    """
+    Maps each calendar day to the contiguous slice of rows for that day.
+    The DataFrame must already be sorted by `column`.
+    """
+    if df.empty:
+        return {}
+
+    # Compare int64 day numbers (in the column's own time zone, like
+    # .dt.date) rather than floored Timestamps, which are Python objects
+    # for tz-aware columns
+    day = day_numbers(df[column])
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    ends = np.r_[starts[1:], len(df)]
+    days = df[column].iloc[starts].dt.date
+
+    return {day: slice(start, end) for day, start, end in zip(days, starts, ends)}
+
+def extend_day_index(day_index: dict, df: pd.DataFrame, column: str, old_rows: int) -> dict:
+    """
+    The day index of `df` from the index of its first `old_rows` rows:
+    only the appended rows are indexed, and the last day's slice grows if
+    they continue it.
+    """
+    day_index = dict(day_index)
+    for day, rows in build_day_index(df.iloc[old_rows:], column).items():
+        rows = slice(rows.start + old_rows, rows.stop + old_rows)
+        if day in day_index and day_index[day].stop == rows.start:
+            rows = slice(day_index[day].start, rows.stop)
+        day_index[day] = rows
+    return day_index
+
+def rows_for_day(df: pd.DataFrame, day_index: dict, target_dt) -> pd.DataFrame:
+    """
+    Returns the rows of `df` that fall on `target_dt` using its day index.
+    """
+    return df.iloc[day_index.get(target_dt, slice(0, 0))]
 
-def get_drain_events(df_today: pd.DataFrame):
+def compute_daily_audit(df: pd.DataFrame, fill_rates: pd.Series, day_index: dict, target_dates) -> pd.DataFrame:
+    """
+    Runs the "Daily Auditor" for every requested date in one grouped pass.
+    Returns one row per (date, cauldron_id) with total_fill, net_change
+    and calculated_drain (Total_Out = Total_Fill - Net_Change).
+    """
+    day_slices = [(d, day_index[d]) for d in dict.fromkeys(target_dates) if d in day_index]
+    positions = np.concatenate([np.arange(sl.start, sl.stop) for _, sl in day_slices] or [np.array([], dtype=np.int64)])
+    dates = np.repeat([d for d, _ in day_slices], [sl.stop - sl.start for _, sl in day_slices])
+
+    df_days = df[['timestamp', 'cauldron_id', 'volume']].iloc[positions]
+    df_days = df_days.assign(date=dates)
+
+    grouped = df_days.groupby(['date', 'cauldron_id'], sort=True, observed=True)
+    audit = grouped.size().to_frame('minutes')
+    if audit.empty:
+        return audit.assign(total_fill=[], net_change=[], calculated_drain=[])
+
+    # Positions of each group's first and last reading (same as .iloc[0] / .iloc[-1])
+    group_codes = grouped.ngroup().to_numpy()
+    order = np.argsort(group_codes, kind='stable')
+    sorted_codes = group_codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    first_rows = order[starts]
+    last_rows = order[ends]
+
+    volume = df_days['volume'].to_numpy(dtype=np.float64)
+    fill_rate = fill_rate_per_row(df_days, fill_rates)
+
+    # 1. Total_Fill = fill_rate * number of minutes
+    audit['total_fill'] = fill_rate[first_rows] * audit['minutes'].to_numpy()
+    # 2. Net_Change = last volume - first volume
+    audit['net_change'] = volume[last_rows] - volume[first_rows]
+    # 3. Total_Out = Total_Fill - Net_Change
+    audit['calculated_drain'] = audit['total_fill'] - audit['net_change']
+    return audit
+
+def get_drain_events(df_levels: pd.DataFrame, fill_rates: pd.Series) -> pd.DataFrame:
     """
     Finds only the "fast drain" events for ticket matching.
+    Events are segmented separately for each cauldron.
+    Returns one row per event: cauldron_id, start_time, total_drain.
     """
     
-    # A "Fast Drain" is any minute the cauldron level drops noticably
-    FAST_DRAIN_THRESHOLD = -0.25
+    df_levels = df_levels.sort_values(by=['cauldron_id', 'timestamp'], kind='stable')
     
-    df_today = df_today.sort_values(by=['cauldron_id', 'timestamp'])
+    cauldron_ids = df_levels['cauldron_id'].to_numpy()
+    delta = df_levels['observed_delta'].to_numpy(dtype=np.float64)
+    fill_rate = fill_rate_per_row(df_levels, fill_rates)
     
     # Find all minutes that are part of a "fast drain"
-    is_draining = df_today['observed_delta'] < FAST_DRAIN_THRESHOLD
+    is_draining = delta < FAST_DRAIN_THRESHOLD
     
-    # Create a 'group_id' for consecutive draining minutes
-    new_event_group = (is_draining != is_draining.shift()).cumsum()
+    # An event starts at a draining minute whose previous row is not
+    # draining or belongs to another cauldron
+    prev_draining = np.r_[False, is_draining[:-1]]
+    same_cauldron = np.r_[False, cauldron_ids[1:] == cauldron_ids[:-1]]
+    event_start = is_draining & ~(prev_draining & same_cauldron)
     
-    # Filter for only the draining minutes
-    draining_data = df_today[is_draining]
+    # Keep only the draining minutes; each event is a run of them
+    draining_rows = np.flatnonzero(is_draining)
+    run_starts = np.flatnonzero(event_start[draining_rows])
+    if len(run_starts) == 0:
+        return pd.DataFrame({
+            'cauldron_id': cauldron_ids[:0],
+            'start_time': df_levels['timestamp'].iloc[:0].array,
+            'total_drain': np.array([], dtype=float),
+        })
     
-    # Group by cauldron AND the new event group
-    events_df = draining_data.groupby(['cauldron_id', new_event_group])
+    # Calculate the total potion lost and the total potion gained
+    # from filling during each event
+    total_delta_loss = np.add.reduceat(delta[draining_rows], run_starts)
+    total_fill_gain = np.add.reduceat(fill_rate[draining_rows], run_starts)
     
-    drain_events_list = []
+    # The true amount the witch took is the gain minus loss
+    total_drain = total_fill_gain - total_delta_loss
     
-    #Loop through each event to calculate its true total drain
-    for (cauldron_id, group_id), event_data in events_df:
-        
-        # Calculate the total potion lost
-        total_delta_loss = event_data['observed_delta'].sum()
-        
-        # Calculate the total potion gained from filling
-        # during that time 
-        total_fill_gain = event_data['fill_rate'].sum()
-        
-        # The true amount the witch took is the gain minus loss
-        total_drain = total_fill_gain - total_delta_loss
-        
-        # Setting a minimum to filter out small fluctuations
-        MINIMUM_TICKET_THRESHOLD = 15.0
-        
-        if total_drain > MINIMUM_TICKET_THRESHOLD:
-            drain_events_list.append({
-                'cauldron_id': cauldron_id,
-                'start_time': event_data['timestamp'].iloc[0],
-                'total_drain': total_drain
-            })
+    first_rows = draining_rows[run_starts]
+    keep = total_drain > MINIMUM_TICKET_THRESHOLD
+    
+    return pd.DataFrame({
+        'cauldron_id': cauldron_ids[first_rows[keep]],
+        'start_time': df_levels['timestamp'].iloc[first_rows[keep]].array,
+        'total_drain': total_drain[keep],
+    })
+
+def build_drain_event_table(df: pd.DataFrame, fill_rates: pd.Series) -> pd.DataFrame:
+    """
+    Finds the drain events over the full history once. A drain that runs
+    past midnight stays one event and belongs to the day it started on.
+    The table is grouped by start day (then cauldron, then time) so it can
+    be indexed with build_day_index.
+    """
+    return order_drain_events(get_drain_events(df, fill_rates))
 
-    return drain_events_list
+def order_drain_events(events: pd.DataFrame) -> pd.DataFrame:
+    start_day = day_numbers(events['start_time'])
+    order = np.lexsort((events['start_time'].to_numpy(), events['cauldron_id'].to_numpy(), start_day))
+    return events.iloc[order].reset_index(drop=True)
 
-def reconcile_events_and_tickets(drain_events_list, tickets_today_list):
+def extend_drain_event_table(events: pd.DataFrame, df: pd.DataFrame, fill_rates: pd.Series,
+                             day_index: dict, old_rows: int) -> tuple:
+    """
+    Updates the drain event table after readings were appended to `df`
+    (its first `old_rows` rows are what `events` was built from, with the
+    same fill rates, and `day_index` indexes them). Only the cauldrons with
+    new readings are segmented again, from their last non-draining reading
+    on, so a drain still running at the old last reading is redone whole.
+    Returns (events, start days of the events that changed).
+    """
+    codes = df['cauldron_id'].cat.codes.to_numpy()
+    categories = df['cauldron_id'].cat.categories
+    timestamps = df['timestamp'].dt.as_unit("ns").array.asi8
+
+    # Walk back a day at a time (a drain rarely spans more) until every
+    # cauldron with new readings has a non-draining reading
+    pending = set(np.unique(codes[old_rows:]))
+    cut = np.full(len(categories), np.iinfo(np.int64).max)
+    scan_start = old_rows
+    for day in sorted(day_index, reverse=True):
+        if not pending:
+            break
+        rows = day_index[day]
+        scan_start = rows.start
+        dry = df['observed_delta'].to_numpy()[rows] >= FAST_DRAIN_THRESHOLD
+        last_dry = pd.Series(timestamps[rows][dry]).groupby(codes[rows][dry]).max()
+        for code, last_time in last_dry.items():
+            if code in pending:
+                cut[code] = last_time
+                pending.discard(code)
+    for code in pending:
+        # Draining ever since its first reading (or new): segment all of it
+        cut[code] = np.iinfo(np.int64).min
+        scan_start = 0
+
+    in_scan = timestamps[scan_start:] >= cut[codes[scan_start:]]
+    redone = get_drain_events(df.iloc[scan_start:][in_scan], fill_rates)
+
+    event_codes = pd.Categorical(events['cauldron_id'], categories=categories).codes
+    replaced = events['start_time'].dt.as_unit("ns").array.asi8 >= cut[event_codes]
+
+    key = ['cauldron_id', 'start_time', 'total_drain']
+    compared = redone[key].astype({'cauldron_id': str}).merge(
+        events[replaced][key].astype({'cauldron_id': str}), how='outer', indicator=True)
+    changed = compared[compared['_merge'] != 'both']
+
+    events = order_drain_events(pd.concat([events[~replaced], redone], ignore_index=True))
+    return events, set(changed['start_time'].dt.date)
+
+class TicketBucket:
+    """
+    One cauldron's matchable tickets sorted by amount_collected.
+    Finds the best-fit ticket for a drain by binary search; removed tickets
+    are skipped through path-compressed "next alive" links.
+    """
+
+    def __init__(self, tickets):
+        # tickets: list of (original_index, ticket), all with amount > 0
+        entries = sorted(tickets, key=lambda t: (t[1]['amount_collected'], t[0]))
+        self.amounts = [ticket['amount_collected'] for _, ticket in entries]
+        self.indexes = [i for i, _ in entries]
+        self.tickets = [ticket for _, ticket in entries]
+
+        n = len(entries)
+        # _next[p]: first alive position >= p (n when none)
+        # _prev[p + 1]: last alive position <= p (-1 when none)
+        self._next = list(range(n + 1))
+        self._prev = list(range(-1, n))
+
+    def _alive_at_or_after(self, pos):
+        root = pos
+        while self._next[root] != root:
+            root = self._next[root]
+        while self._next[pos] != root:
+            self._next[pos], pos = root, self._next[pos]
+        return root
+
+    def _alive_at_or_before(self, pos):
+        slot = pos + 1
+        root = slot
+        while self._prev[root] != root - 1:
+            root = self._prev[root] + 1
+        while self._prev[slot] != root - 1:
+            self._prev[slot], slot = root - 1, self._prev[slot] + 1
+        return root - 1
+
+    def best_fit(self, drain):
+        """
+        Returns (diff_percent, position) of the ticket with the smallest
+        percentage difference to `drain`, or None if the bucket is empty.
+        Ties go to the ticket that came first in the original list.
+        """
+        # |drain - amount| / amount only decreases up to `drain` and only
+        # increases after it, so the best fit is a neighbour of `drain`.
+        split = bisect.bisect_left(self.amounts, drain)
+        candidates = []
+
+        above = self._alive_at_or_after(split)
+        if above < len(self.amounts):
+            candidates.append(above)
+
+        below = self._alive_at_or_before(split - 1)
+        if below >= 0:
+            # First alive ticket with that same amount
+            group_start = bisect.bisect_left(self.amounts, self.amounts[below])
+            candidates.append(self._alive_at_or_after(group_start))
+
+        best = None
+        for pos in candidates:
+            amount = self.amounts[pos]
+            diff_percent = abs(drain - amount) / amount
+            key = (diff_percent, self.indexes[pos])
+            if best is None or key < best[0]:
+                best = (key, pos)
+
+        if best is None:
+            return None
+        return best[0][0], best[1]
+
+    def remove(self, pos):
+        self._next[pos] = pos + 1
+        self._prev[pos + 1] = pos - 1
+
+def reconcile_events_and_tickets(drain_events_list, tickets_today_list, mode="greedy"):
     """
     Matches drain events to tickets using a "best-fit" algorithm.
+    mode="optimal" instead solves the whole matching as an assignment problem
+    (see reconcile_optimal).
     """
+    if mode == "optimal":
+        return reconcile_optimal(drain_events_list, tickets_today_list)
     
     flagged_tickets = []
     unlogged_drains = []
@@ -105,47 +391,35 @@ def reconcile_events_and_tickets(drain_events_list, tickets_today_list):
     
     events_to_match = list(drain_events_list)
     tickets_to_match = list(tickets_today_list)
-    
-    # We can keep a 5% tolerance between events and tickets for matching
-    MATCH_TOLERANCE = 0.05
+
+    # Bucket the tickets by cauldron, sorted by amount
+    # (Can't match with a 0L ticket, so those never enter a bucket)
+    tickets_by_cauldron = {}
+    for i, ticket in enumerate(tickets_to_match):
+        if ticket['amount_collected'] > 0:
+            tickets_by_cauldron.setdefault(ticket['cauldron_id'], []).append((i, ticket))
+    buckets = {cid: TicketBucket(tickets) for cid, tickets in tickets_by_cauldron.items()}
+
+    matched_indexes = set()
 
     # Loop through each DRAIN EVENT
     for event in events_to_match:
         
-        best_match_ticket = None
-        smallest_diff_percent = float('inf') # Start with infinity
-        ticket_index_to_remove = -1
+        # Finding the best match among this cauldron's tickets
+        bucket = buckets.get(event['cauldron_id'])
+        best_fit = bucket.best_fit(event['total_drain']) if bucket is not None else None
 
-        # Finding the best match
-        # Loop through all available tickets to find the single best partner
-        for i, ticket in enumerate(tickets_to_match):
-            
-            # Only compare tickets for the same cauldron
-            if event['cauldron_id'] == ticket['cauldron_id']:
-                
-                # Calculate the percentage difference
-                # (Handle division by zero if ticket amount is 0)
-                if ticket['amount_collected'] > 0:
-                    diff_percent = abs(event['total_drain'] - ticket['amount_collected']) / ticket['amount_collected']
-                else:
-                    diff_percent = float('inf') # Can't match with a 0L ticket
-                
-                # If this is the new "best" match, record it
-                if diff_percent < smallest_diff_percent:
-                    smallest_diff_percent = diff_percent
-                    best_match_ticket = ticket
-                    ticket_index_to_remove = i
-
-        # Validating the best app
-        # After checking all tickets, see if our best find is correspondence
-        if best_match_ticket is not None and smallest_diff_percent <= MATCH_TOLERANCE:
+        # Validating the best match
+        if best_fit is not None and best_fit[0] <= MATCH_TOLERANCE:
+            pos = best_fit[1]
             reconciled_pairs.append({
-                "ticket": best_match_ticket,
+                "ticket": bucket.tickets[pos],
                 "event": event
             })
             
             # Remove the ticket from the pool so it can't be used again
-            tickets_to_match.pop(ticket_index_to_remove)
+            bucket.remove(pos)
+            matched_indexes.add(bucket.indexes[pos])
         
         else:
             # This event had no good match (or no match at all).
@@ -154,11 +428,114 @@ def reconcile_events_and_tickets(drain_events_list, tickets_today_list):
 
     # Marking remaining tickets as flagged
     # Any tickets left in the pool at the end are "ghost" tickets.
-    flagged_tickets = tickets_to_match
+    flagged_tickets = [t for i, t in enumerate(tickets_to_match) if i not in matched_indexes]
 
     return flagged_tickets, unlogged_drains, reconciled_pairs
 
-app = FastAPI()
+def optimal_mode_available() -> bool:
+    """
+    mode="optimal" needs scipy's assignment solver; it's only imported
+    when that mode is used, so the server runs without scipy.
+    """
+    try:
+        import scipy.optimize  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def reconcile_optimal(drain_events_list, tickets_today_list):
+    """
+    Matches drain events to tickets as a minimum-cost bipartite assignment:
+    first the largest possible number of pairs within MATCH_TOLERANCE, then
+    the smallest total percentage difference. Unlike the greedy best-fit,
+    the result doesn't depend on the order of the events.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    events = list(drain_events_list)
+    tickets = list(tickets_today_list)
+
+    # Only pairs within tolerance are ever considered (a sparse cost matrix).
+    # |drain - amount| / amount <= tol  <=>  drain / (1 + tol) <= amount <= drain / (1 - tol)
+    tickets_by_cauldron = {}
+    for j, ticket in enumerate(tickets):
+        if ticket['amount_collected'] > 0:
+            tickets_by_cauldron.setdefault(ticket['cauldron_id'], []).append(j)
+    for cid, ticket_ids in tickets_by_cauldron.items():
+        ticket_ids.sort(key=lambda j: tickets[j]['amount_collected'])
+    sorted_amounts = {
+        cid: [tickets[j]['amount_collected'] for j in ticket_ids]
+        for cid, ticket_ids in tickets_by_cauldron.items()
+    }
+
+    pairs = {}
+    for i, event in enumerate(events):
+        cid = event['cauldron_id']
+        if cid not in tickets_by_cauldron:
+            continue
+        drain = event['total_drain']
+        amounts = sorted_amounts[cid]
+        lo = bisect.bisect_left(amounts, drain / (1 + MATCH_TOLERANCE))
+        hi = bisect.bisect_right(amounts, drain / (1 - MATCH_TOLERANCE)) if MATCH_TOLERANCE < 1 else len(amounts)
+        for k in range(max(lo - 1, 0), min(hi + 1, len(amounts))):
+            diff_percent = abs(drain - amounts[k]) / amounts[k]
+            if diff_percent <= MATCH_TOLERANCE:
+                pairs[(i, tickets_by_cauldron[cid][k])] = diff_percent
+
+    # Split the pairs into independent groups (connected components)
+    # so each assignment problem stays small
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for i, j in pairs:
+        parent[find(('e', i))] = find(('t', j))
+
+    components = {}
+    for i, j in pairs:
+        components.setdefault(find(('e', i)), []).append((i, j))
+
+    matched = {}
+    for component_pairs in components.values():
+        event_ids = sorted({i for i, _ in component_pairs})
+        ticket_ids = sorted({j for _, j in component_pairs})
+        row = {i: r for r, i in enumerate(event_ids)}
+        col = {j: c for c, j in enumerate(ticket_ids)}
+
+        # Every real pair is worth more than any total of differences,
+        # so the solver maximizes the number of matches first
+        pair_value = 1.0 + MATCH_TOLERANCE * min(len(event_ids), len(ticket_ids))
+        cost = np.zeros((len(event_ids), len(ticket_ids)))
+        for i, j in component_pairs:
+            cost[row[i], col[j]] = pairs[(i, j)] - pair_value
+
+        rows, cols = linear_sum_assignment(cost)
+        for r, c in zip(rows, cols):
+            if (event_ids[r], ticket_ids[c]) in pairs:
+                matched[event_ids[r]] = ticket_ids[c]
+
+    reconciled_pairs = [{"ticket": tickets[matched[i]], "event": event} for i, event in enumerate(events) if i in matched]
+    unlogged_drains = [event for i, event in enumerate(events) if i not in matched]
+    used_tickets = set(matched.values())
+    flagged_tickets = [ticket for j, ticket in enumerate(tickets) if j not in used_tickets]
+
+    return flagged_tickets, unlogged_drains, reconciled_pairs
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the data in the background so the server binds right away;
+    # /health reports progress and /query_days waits for it
+    threading.Thread(target=load_initial_data, name="data-loader", daemon=True).start()
+    yield
+    with _pool_lock:
+        shutdown_analysis_pool()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -167,42 +544,332 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-cauldron_df = api_loader.fetch_cauldron_levels()
-tickets_df = api_loader.fetch_tickets()
-cauldron_df = add_analysis_columns(cauldron_df)
+# --- Per-day result cache ---
+# Closed days never change, so each day's analysis is kept (LRU) until
+# the underlying data is reloaded (load_data) or refreshed (refresh_data).
+DAY_CACHE_SIZE = 512
+_day_cache = OrderedDict()
+_day_cache_lock = threading.Lock()
 
-# --- MAIN SCRIPT Testing (This runs when you execute the file) ---
-if __name__ == "__main__":
-    uvicorn.run("analysis:app", host="127.0.0.1", port=8000, reload=True)
+# Bumped whenever the data changes, so results computed on old data
+# never make it into the cache
+data_version = 0
+_refresh_lock = threading.Lock()
 
-class QDayData(BaseModel):
-    days: list[str]
-@app.post("/query_days")
-def query_day(in_days: QDayData):
-    # --- STEP 3: DEFINE THE DATES YOU WANT TO TEST ---
-    #
-    # THIS IS THE PART YOU CHANGE
-    # Instead of finding unique dates, just define your list.
-    # Use 'YYYY-MM-DD' format.
-    #
-    dates_to_test = in_days.days
-    
-    # This list will hold our final report
-    all_results = []
+def analysis_params(mode="greedy", fill_rate_window=0) -> tuple:
+    """
+    The parameters a cached day result depends on.
+    """
+    return (FAST_DRAIN_THRESHOLD, MINIMUM_TICKET_THRESHOLD, MATCH_TOLERANCE, mode, fill_rate_window)
 
-    # --- STEP 4: LOOP AND ANALYZE EACH DAY ---
-    for target_date_str in dates_to_test:
-        
-        # Convert the string to a datetime.date object
-        target_dt = pd.to_datetime(target_date_str).date()
+def cache_day(key, day_summary, version):
+    with _day_cache_lock:
+        if version != data_version:
+            return
+        _day_cache[key] = day_summary
+        _day_cache.move_to_end(key)
+        while len(_day_cache) > DAY_CACHE_SIZE:
+            _day_cache.popitem(last=False)
+
+def clear_day_cache():
+    with _day_cache_lock:
+        _day_cache.clear()
+
+def invalidate_days(days):
+    """
+    Drops the cached results (for every parameter set) of the given days.
+    """
+    days = set(days)
+    with _day_cache_lock:
+        for key in [k for k in _day_cache if k[0] in days]:
+            del _day_cache[key]
+
+def install_data(levels_df: pd.DataFrame, fill_rates: pd.Series, tickets: pd.DataFrame, events: pd.DataFrame,
+                 store_meta: dict = None, levels_index: dict = None):
+    """
+    Makes analyzed, time-sorted levels (with their fill rates), tickets
+    and drain events the server's data and rebuilds their day indexes
+    (`levels_index` is the levels' one if it's already known). `store_meta`
+    is the shared store generation the levels are mapped from, if they are.
+    """
+    global cauldron_df, cauldron_fill_rates, tickets_df, cauldron_day_index, tickets_day_index
+    global drain_events_df, drain_events_day_index, data_version, cauldron_store_meta
+
+    new_indexes = (
+        levels_index if levels_index is not None else build_day_index(levels_df, 'timestamp'),
+        build_day_index(tickets, 'date'),
+        build_day_index(events, 'start_time'),
+    )
+    with _day_cache_lock:
+        cauldron_df, cauldron_fill_rates, cauldron_store_meta = levels_df, fill_rates, store_meta
+        tickets_df, drain_events_df = tickets, events
+        cauldron_day_index, tickets_day_index, drain_events_day_index = new_indexes
+        data_version += 1
+
+def prepare_levels(levels_df: pd.DataFrame) -> tuple:
+    """
+    Sorts freshly fetched levels by time and adds the analysis columns.
+    Returns (levels, fill_rates).
+    """
+    # Sort once by time so every day is a contiguous block of rows
+    # (the long view of the level matrix already is)
+    if not levels_df['timestamp'].is_monotonic_increasing:
+        levels_df = levels_df.sort_values(by='timestamp', kind='stable', ignore_index=True)
+    return add_analysis_columns(levels_df)
+
+def load_data(levels_df: pd.DataFrame, tickets: pd.DataFrame):
+    """
+    Installs freshly fetched levels and tickets as the server's data,
+    rebuilds the day indexes and drops every cached day result.
+    """
+    levels_df, fill_rates = prepare_levels(levels_df)
+    tickets = tickets.sort_values(by='date', kind='stable', ignore_index=True)
+
+    # Drain events are found once for the whole history
+    install_data(levels_df, fill_rates, tickets, build_drain_event_table(levels_df, fill_rates))
+    clear_day_cache()
+    reset_fill_rate_sketches()
+
+# --- Time-varying fill rates ---
+# With fill_rate_window=N, the auditor and the drain totals use each
+# cauldron's median fill rate over the N days ending on the row's day
+# instead of one baseline over the whole history. The rates come from
+# per-day sketches (fill_rate_sketch.py) that are built on first use and
+# only extended after that, since refreshes only ever append readings.
+# A refresh changes the rates of its own days and the days after them,
+# which it invalidates anyway.
+MAX_FILL_RATE_WINDOW = 365
+
+_fill_rate_lock = threading.Lock()
+# (data_version, sketches) of the newest data sketched so far
+fill_rate_sketches = None
+# window -> (data_version, rate grid, drain events, events day index)
+_rolling_fill_rates = {}
+
+def reset_fill_rate_sketches():
+    global fill_rate_sketches
+    with _fill_rate_lock:
+        fill_rate_sketches = None
+        _rolling_fill_rates.clear()
+
+def rolling_fill_rate_data(levels: pd.DataFrame, fill_rates: pd.Series, version: int, window: int) -> tuple:
+    """
+    The rate grid for `window` days and the drain events found with it,
+    for one data version. Returns (grid, events, events_day_index).
+    """
+    global fill_rate_sketches
+    with _fill_rate_lock:
+        cached = _rolling_fill_rates.get(window)
+        if cached is not None and cached[0] == version:
+            return cached[1:]
+
+        if fill_rate_sketches is None:
+            sketches = fill_rate_sketch.build_sketches(levels)
+        elif fill_rate_sketches[0] <= version:
+            sketches = fill_rate_sketch.update_sketches(fill_rate_sketches[1], levels)
+        else:
+            # A request still working on data older than the sketches
+            sketches = fill_rate_sketch.build_sketches(levels)
+
+        days = fill_rate_sketch.day_numbers(levels['timestamp'].iloc[[0, -1]])
+        grid = fill_rate_sketch.rolling_fill_rates(sketches, window, fill_rates, days[0], days[1])
+        events = build_drain_event_table(levels, grid)
+        entry = (version, grid, events, build_day_index(events, 'start_time'))
+
+        if fill_rate_sketches is None or fill_rate_sketches[0] <= version:
+            fill_rate_sketches = (version, sketches)
+            _rolling_fill_rates[window] = entry
+    return entry[1:]
+
+# --- Shared level store ---
+# With several uvicorn workers, the analyzed level history is written once
+# to memory-mapped files (see level_store.py) that every worker maps
+# read-only, instead of each worker fetching and holding its own copy.
+# A single worker keeps the levels in memory as before. uvicorn's
+# --workers defaults to WEB_CONCURRENCY; when passing --workers N instead,
+# set HACKUTD_WORKERS=N too. HACKUTD_SHARED_STORE=1 / 0 turns the store
+# on / off regardless (e.g. on, for "parallel" queries with one worker).
+SERVER_WORKERS = int(os.environ.get("HACKUTD_WORKERS") or os.environ.get("WEB_CONCURRENCY") or 1)
+USE_SHARED_STORE = (
+    os.environ.get("HACKUTD_SHARED_STORE", "1" if SERVER_WORKERS > 1 else "0") != "0"
+    and level_store.available()
+)
+store_generation = None
+
+def load_shared_data():
+    """
+    Maps the shared level store, building it first if no other worker of
+    this run has, and installs it as the server's data.
+    """
+    global store_generation
+    # The store holds the levels from here on, so don't keep the matrix too
+    meta, levels_df = level_store.attach_or_build(
+        lambda: prepare_levels(api_loader.load_levels(keep_matrix=False))
+    )
+    tickets = api_loader.load_tickets().sort_values(by='date', kind='stable', ignore_index=True)
+
+    fill_rates = level_store.read_fill_rates(meta)
+    install_data(levels_df, fill_rates, tickets, build_drain_event_table(levels_df, fill_rates), meta)
+    clear_day_cache()
+    store_generation = meta['generation']
+
+def sync_shared_store():
+    """
+    Switches to a newer store generation published by another worker's
+    refresh, if there is one.
+    """
+    global store_generation
+    if not USE_SHARED_STORE or level_store.read_meta().get('generation') == store_generation:
+        return
+
+    with _refresh_lock:
+        meta = level_store.read_meta()
+        if meta.get('generation') == store_generation:
+            return
+        try:
+            levels_df = level_store.open_store(meta=meta)
+        except FileNotFoundError:
+            return  # replaced again while we were mapping it, try next time
+        tickets = api_loader.load_tickets().sort_values(by='date', kind='stable', ignore_index=True)
+
+        fill_rates = level_store.read_fill_rates(meta)
+        install_data(levels_df, fill_rates, tickets, build_drain_event_table(levels_df, fill_rates), meta)
+        clear_day_cache()
+        store_generation = meta['generation']
+    print(f"Switched to shared level store generation {store_generation}.")
+
+def ticket_day_hashes(tickets: pd.DataFrame) -> dict:
+    """
+    One hash per day of the day's tickets, to spot which days changed.
+    """
+    if tickets.empty:
+        return {}
+    row_hashes = pd.util.hash_pandas_object(tickets, index=False)
+    return row_hashes.groupby(tickets['date'].dt.date.to_numpy()).sum().to_dict()
+
+def refresh_data() -> dict:
+    """
+    Pulls only the readings newer than the last one we have (plus the
+    current tickets), appends them and invalidates just the days whose
+    results can have changed.
+    """
+    global store_generation
+    sync_shared_store()
+
+    with _refresh_lock:
+        levels_df, fill_rates, old_events = cauldron_df, cauldron_fill_rates, drain_events_df
+        meta = cauldron_store_meta
+        old_ticket_hashes = ticket_day_hashes(tickets_df)
+
+        since = levels_df['timestamp'].iloc[-1] if not levels_df.empty else None
+        new_levels = api_loader.fetch_new_cauldron_levels(since)
+        tickets = api_loader.fetch_tickets().sort_values(by='date', kind='stable', ignore_index=True)
+        new_levels = new_levels.sort_values(by='timestamp', kind='stable', ignore_index=True)
+        api_loader.extend_level_matrix(new_levels)
+        api_loader.append_levels_snapshot(new_levels)
+        api_loader.save_snapshot(tickets=tickets)
+
+        changed_days = set()
+        rates_changed = False
+        events, levels_index = old_events, cauldron_day_index
+        if not new_levels.empty:
+            if levels_df.empty:
+                levels_df, fill_rates = add_analysis_columns(new_levels)
+                events, levels_index = build_drain_event_table(levels_df, fill_rates), None
+            else:
+                old_rows, old_index = len(levels_df), cauldron_day_index
+                old_last = levels_df['timestamp'].iloc[-1]
+                last_day_rows = rows_for_day(levels_df, old_index, old_last.date())
+                old_rates = fill_rates
+                levels_df, fill_rates = extend_analysis_columns(levels_df, new_levels, last_day_rows)
+                levels_index = extend_day_index(old_index, levels_df, 'timestamp', old_rows)
+                changed_days.add(old_last.date())
+
+                # A cauldron's fill rate enters every day's audit (and every drain)
+                rates_changed = not fill_rates.reindex(old_rates.index).equals(old_rates)
+                if rates_changed:
+                    events = build_drain_event_table(levels_df, fill_rates)
+                else:
+                    # Drains still running at the old last reading can grow (or
+                    # newly pass the threshold), which changes the day they started on
+                    events, event_days = extend_drain_event_table(old_events, levels_df, fill_rates, old_index, old_rows)
+                    changed_days |= event_days
+            changed_days |= set(new_levels['timestamp'].dt.date.unique())
+
+        new_ticket_hashes = ticket_day_hashes(tickets)
+        changed_days |= {
+            day for day in set(old_ticket_hashes) | set(new_ticket_hashes)
+            if old_ticket_hashes.get(day) != new_ticket_hashes.get(day)
+        }
+
+        # Let the other workers map the refreshed history too
+        if USE_SHARED_STORE and not new_levels.empty:
+            meta, levels_df = level_store.publish(levels_df, fill_rates)
+            store_generation = meta['generation']
+
+        install_data(levels_df, fill_rates, tickets, events, meta, levels_index)
+        if rates_changed:
+            changed_days |= set(cauldron_day_index)
+        invalidate_days(changed_days)
+
+    print(f"Refreshed: {len(new_levels)} new readings, {len(changed_days)} days invalidated.")
+    return {
+        "new_readings": len(new_levels),
+        "invalidated_days": sorted(str(day) for day in changed_days),
+    }
+
+def analyze_days(target_dates, mode="greedy", fill_rate_window=0, parallel=False) -> dict:
+    """
+    Runs the auditor and the reconciliation for each date and caches
+    the results. Returns {date: day_summary}, with None for days that
+    have no data. fill_rate_window > 0 uses rolling fill rates;
+    parallel=True spreads the days over worker processes.
+    """
+    params = analysis_params(mode, fill_rate_window)
+
+    if parallel and ANALYSIS_WORKERS > 1 and len(target_dates) > 1:
+        chunks = analyze_days_parallel(target_dates, mode, fill_rate_window)
+    else:
+        chunks = [compute_days(target_dates, mode, fill_rate_window)]
+
+    results = {}
+    for version, chunk_results in chunks:
+        for target_dt, day_summary in chunk_results.items():
+            results[target_dt] = day_summary
+            cache_day((target_dt, params), day_summary, version)
+    return results
+
+def compute_days(target_dates, mode="greedy", fill_rate_window=0) -> tuple:
+    """
+    Analyzes each date on one consistent snapshot of the data, without
+    touching the day cache. Returns (data_version, {date: day_summary}).
+    """
+    results = {}
+
+    # Work on one consistent snapshot even if a refresh swaps the data
+    with _day_cache_lock:
+        levels, levels_index, fill_rates = cauldron_df, cauldron_day_index, cauldron_fill_rates
+        tickets, tickets_index = tickets_df, tickets_day_index
+        events, events_index = drain_events_df, drain_events_day_index
+        version = data_version
+
+    # Time-varying fill rates come with their own drain events
+    if fill_rate_window and not levels.empty:
+        fill_rates, events, events_index = rolling_fill_rate_data(levels, fill_rates, version, fill_rate_window)
+
+    # Run the daily auditor for every day in one vectorized pass
+    daily_audit = compute_daily_audit(levels, fill_rates, levels_index, target_dates)
+    daily_drain_totals = daily_audit.groupby(level='date')['calculated_drain'].sum()
+
+    for target_dt in target_dates:
         
         # Filter data for the specific day
-        df_today = cauldron_df[cauldron_df['timestamp'].dt.date == target_dt]
-        tickets_today = tickets_df[tickets_df['date'].dt.date == target_dt]
+        df_today = rows_for_day(levels, levels_index, target_dt)
+        tickets_today = rows_for_day(tickets, tickets_index, target_dt)
 
         # Check if there is data for this day
         if df_today.empty and tickets_today.empty:
-            print(f"No data found for {target_date_str}, skipping.")
+            results[target_dt] = None
             continue
         
         # Get the total number of tickets by finding the length of the DataFrame
@@ -211,47 +878,22 @@ def query_day(in_days: QDayData):
         # You can now use this variable. Let's print it:
         print(f"--- Found {total_tickets_count} tickets for {target_dt} ---")
         
-        # --- A. "Daily Auditor" Check (New Robust Logic) ---
-        
-        # This logic is now separate and more accurate.
-        # It calculates: Total_Out = Total_Fill - Net_Change
-        
-        total_calculated_drain = 0
-        
-        # Loop through each cauldron's data for the day
-        for cauldron_id, data in df_today.groupby('cauldron_id'):
-            if data.empty:
-                continue
-                
-            # Get the single fill_rate for this cauldron (from Step 2)
-            fill_rate = data['fill_rate'].iloc[0]
-            
-            # 1. Calculate Total_Fill
-            # (e.g., 1.5L/min * 1440 minutes)
-            total_fill = fill_rate * len(data) # len(data) is num of minutes
-            
-            # 2. Calculate Net_Change
-            volume_start = data['volume'].iloc[0]
-            volume_end = data['volume'].iloc[-1]
-            net_change = volume_end - volume_start
-            
-            # 3. The formula: Total_Out = Total_Fill - Net_Change
-            cauldron_drain_total = total_fill - net_change
-            
-            # Add this cauldron's total drain to the day's total
-            total_calculated_drain += cauldron_drain_total
-            
+        # --- A. "Daily Auditor" Check ---
+        # Computed for all days up front (see compute_daily_audit)
+        total_calculated_drain = daily_drain_totals.get(target_dt, 0)
+
         # Now get the final discrepancy
         total_ticketed_drain = tickets_today['amount_collected'].sum()
         total_discrepancy = total_calculated_drain - total_ticketed_drain
 
         # --- B. "Detective" Check (Reconciliation) ---
-        drain_events = get_drain_events(df_today)
+        drain_events = rows_for_day(events, events_index, target_dt).to_dict('records')
         tickets_today_list = tickets_today.to_dict('records')
         
         flagged_tickets, unlogged_drains, reconciled_pairs = reconcile_events_and_tickets(
             drain_events, 
-            tickets_today_list
+            tickets_today_list,
+            mode=mode
         )
         
         # --- C. Store the results for this day ---
@@ -264,6 +906,357 @@ def query_day(in_days: QDayData):
             "unlogged_drains": unlogged_drains,
             "reconciled_pairs": reconciled_pairs
         }
+
+        # Report how much the optimal matching gains over the greedy one
+        if mode == "optimal":
+            greedy_flagged, greedy_unlogged, _ = reconcile_events_and_tickets(drain_events, tickets_today_list)
+            day_summary["fewer_flagged_tickets_than_greedy"] = len(greedy_flagged) - len(flagged_tickets)
+            day_summary["fewer_unlogged_drains_than_greedy"] = len(greedy_unlogged) - len(unlogged_drains)
+
+        results[target_dt] = day_summary
+
+    return version, results
+
+# --- Parallel analysis ---
+# With "parallel": true the requested days are split into chunks that a
+# pool of worker processes analyzes side by side. The workers don't fork
+# the running server (its sockets, event loop threads and locks would be
+# copied into them); they are started fresh (forkserver, or spawn) and
+# map the shared level store (see level_store.py) the server's levels
+# come from, so the history isn't pickled into them. The pool is started
+# again once the data changes. Without a store (the default with a single
+# uvicorn worker, see USE_SHARED_STORE), days are analyzed serially.
+ANALYSIS_WORKERS = int(os.environ.get("HACKUTD_ANALYSIS_WORKERS", "0")) or os.cpu_count() or 1
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Chunks per worker, so one slow chunk doesn't hold up the others
+CHUNKS_PER_WORKER = 4
+
+_pool_lock = threading.Lock()
+_analysis_pool = None
+_analysis_pool_version = None
+
+def _init_analysis_worker(meta, tickets, events, version):
+    # Same data (and data version) as the server that started the pool
+    global data_version
+    levels_df = level_store.open_store(meta=meta)
+    install_data(levels_df, level_store.read_fill_rates(meta), tickets, events, meta)
+    data_version = version
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    """
+    The worker pool, started (again) if the data changed since it was.
+    None if the levels don't come from the shared store.
+    """
+    global _analysis_pool, _analysis_pool_version
+    with _day_cache_lock:
+        meta, tickets, events, version = cauldron_store_meta, tickets_df, drain_events_df, data_version
+    if meta is None:
+        return None
+
+    with _pool_lock:
+        if _analysis_pool is None or _analysis_pool_version != version:
+            shutdown_analysis_pool()
+            context = multiprocessing.get_context(POOL_START_METHOD)
+            if POOL_START_METHOD == "forkserver":
+                # The fork server imports this module once; workers fork from it
+                context.set_forkserver_preload([__name__])
+            _analysis_pool = ProcessPoolExecutor(
+                max_workers=ANALYSIS_WORKERS,
+                mp_context=context,
+                initializer=_init_analysis_worker,
+                initargs=(meta, tickets, events, version),
+            )
+            _analysis_pool_version = version
+        return _analysis_pool
+
+def shutdown_analysis_pool():
+    global _analysis_pool
+    if _analysis_pool is not None:
+        # Requests still using the old pool get their results first
+        _analysis_pool.shutdown(wait=False)
+        _analysis_pool = None
+
+def analyze_days_parallel(target_dates, mode="greedy", fill_rate_window=0) -> list:
+    """
+    Runs compute_days over chunks of consecutive dates in the worker pool
+    (each worker builds its own rolling fill rates, once per window).
+    Returns the chunks' (data_version, results) in date order.
+    """
+    n_chunks = min(len(target_dates), ANALYSIS_WORKERS * CHUNKS_PER_WORKER)
+    bounds = np.linspace(0, len(target_dates), n_chunks + 1).astype(int)
+    chunks = [target_dates[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    try:
+        pool = get_analysis_pool()
+        if pool is None:
+            return [compute_days(target_dates, mode, fill_rate_window)]
+        return list(pool.map(compute_days, chunks, [mode] * len(chunks), [fill_rate_window] * len(chunks)))
+    except BrokenProcessPool as e:
+        print(f"Analysis pool failed ({e!r}), analyzing serially.")
+        with _pool_lock:
+            shutdown_analysis_pool()
+        return [compute_days(target_dates, mode, fill_rate_window)]
+
+# --- Request coalescing ---
+# Concurrent requests for overlapping days (e.g. several tabs loading the
+# same range) share the work: the first request to miss the cache for a
+# day analyzes it, later ones wait for that result instead of repeating it.
+_in_flight_days = {}
+coalescing_stats = {"computed_days": 0, "shared_days": 0, "cached_days": 0}
+
+def get_days(target_dates, mode="greedy", fill_rate_window=0, parallel=False) -> dict:
+    """
+    The summaries of the given dates ({date: day_summary}, None for days
+    without data): cached, shared with a request already analyzing them,
+    or analyzed here.
+    """
+    params = analysis_params(mode, fill_rate_window)
+    results, owned, waiting = {}, {}, {}
+
+    with _day_cache_lock:
+        for target_dt in dict.fromkeys(target_dates):
+            key = (target_dt, params)
+            if key in _day_cache:
+                _day_cache.move_to_end(key)
+                results[target_dt] = _day_cache[key]
+            elif key in _in_flight_days:
+                waiting[target_dt] = _in_flight_days[key]
+            else:
+                owned[target_dt] = _in_flight_days[key] = Future()
+        coalescing_stats["cached_days"] += len(results)
+        coalescing_stats["shared_days"] += len(waiting)
+        coalescing_stats["computed_days"] += len(owned)
+
+    # Analyze our own days before waiting, so two requests waiting on each
+    # other's days always make progress
+    try:
+        if owned:
+            computed = analyze_days(list(owned), mode=mode, fill_rate_window=fill_rate_window, parallel=parallel)
+            results.update(computed)
+            for target_dt, future in owned.items():
+                future.set_result(computed[target_dt])
+    except BaseException as e:
+        for future in owned.values():
+            if not future.done():
+                future.set_exception(e)
+        raise
+    finally:
+        # The results are cached by now (unless the data changed meanwhile)
+        with _day_cache_lock:
+            for target_dt in owned:
+                del _in_flight_days[(target_dt, params)]
+
+    for target_dt, future in waiting.items():
+        results[target_dt] = future.result()
+    return results
+
+# --- Cancellation ---
+# /query_days analyzes the requested days a batch at a time and checks
+# between batches whether the client is still connected; once it's gone
+# (browser navigated away, request timed out) the remaining days are
+# skipped so the worker is free for requests someone is waiting on.
+# Days already analyzed stay cached for the next request.
+
+# Days analyzed between two checks: a day at a time would repeat the
+# grouped daily audit per day (~3x slower over a full history)
+CANCEL_CHECK_DAYS = 7
+
+cancellation_stats = {"cancelled_requests": 0, "skipped_days": 0}
+
+def client_disconnected(request: Request) -> bool:
+    """
+    True if the client that sent `request` has disconnected. Call it from
+    the worker thread a sync endpoint (or streaming generator) runs in.
+    """
+    return anyio.from_thread.run(request.is_disconnected)
+
+def record_cancellation(skipped_days: int):
+    print(f"Client disconnected, skipping the remaining {skipped_days} days.")
+    with _day_cache_lock:
+        cancellation_stats["cancelled_requests"] += 1
+        cancellation_stats["skipped_days"] += skipped_days
+
+if __name__ == "__main__":
+    # The uvicorn processes started below map the store this one builds
+    os.environ.setdefault("HACKUTD_RUN_ID", str(os.getpid()))
+
+# --- Startup ---
+# Nothing is loaded at import time; load_initial_data runs in a background
+# thread once the server starts (see lifespan).
+cauldron_df = cauldron_fill_rates = cauldron_store_meta = tickets_df = drain_events_df = None
+cauldron_day_index = tickets_day_index = drain_events_day_index = {}
+
+# How long /query_days waits for the initial load before giving up
+DATA_WAIT_TIMEOUT = 60.0
+
+data_ready = threading.Event()
+data_load_state = {"status": "loading", "error": None, "started_at": None, "finished_at": None}
+
+def report_memory():
+    """
+    Prints how much memory the loaded data takes.
+    """
+    frames = {
+        "levels": cauldron_df,
+        "fill rates": cauldron_fill_rates,
+        "tickets": tickets_df,
+        "drain events": drain_events_df,
+    }
+    total = 0
+    for name, frame in frames.items():
+        size = int(np.sum(frame.memory_usage(deep=True)))
+        total += size
+        print(f"  - {name}: {len(frame)} rows, {size / 2**20:.1f} MiB")
+    shared = " (levels memory-mapped, shared between workers)" if USE_SHARED_STORE else ""
+    print(f"Data in memory: {total / 2**20:.1f} MiB{shared}")
+
+def load_initial_data():
+    data_load_state["started_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    try:
+        if USE_SHARED_STORE:
+            load_shared_data()
+        else:
+            load_data(*api_loader.fetch_levels_and_tickets())
+        data_load_state["status"] = "ready"
+        report_memory()
+    except Exception as e:
+        print(f"Loading data failed: {e!r}")
+        data_load_state["status"] = "failed"
+        data_load_state["error"] = repr(e)
+    finally:
+        data_load_state["finished_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        data_ready.set()
+
+def wait_for_data(wait: bool = True) -> bool:
+    """
+    True once the data is loaded. With wait=True, blocks until the
+    initial load finishes (up to DATA_WAIT_TIMEOUT seconds).
+    """
+    if wait:
+        data_ready.wait(DATA_WAIT_TIMEOUT)
+    return data_load_state["status"] == "ready"
+
+def not_ready_response() -> JSONResponse:
+    return JSONResponse(status_code=503, content=data_load_state)
+
+# --- MAIN SCRIPT Testing (This runs when you execute the file) ---
+if __name__ == "__main__":
+    uvicorn.run("analysis:app", host="127.0.0.1", port=8000, reload=True)
+
+@app.get("/health")
+def health():
+    # 200 once the data is loaded, 503 while loading (or if loading failed)
+    status_code = 200 if data_load_state["status"] == "ready" else 503
+    content = dict(data_load_state, rows=len(cauldron_df) if cauldron_df is not None else 0)
+    return JSONResponse(status_code=status_code, content=content)
+
+@app.get("/metrics")
+def metrics():
+    # How many requested days came from the cache, were shared with a
+    # concurrent request (computations saved) or were analyzed
+    with _day_cache_lock:
+        return dict(
+            coalescing_stats,
+            **cancellation_stats,
+            cached_results=len(_day_cache),
+            in_flight_days=len(_in_flight_days),
+        )
+
+@app.post("/refresh")
+def refresh():
+    # Pull in readings (and tickets) that arrived since the last load
+    if not wait_for_data():
+        return not_ready_response()
+    return refresh_data()
+
+class QDayData(BaseModel):
+    days: list[str]
+    mode: Literal["greedy", "optimal"] = "greedy"
+    # 0: one baseline fill rate per cauldron; N: rolling N-day median
+    fill_rate_window: int = Field(0, ge=0, le=MAX_FILL_RATE_WINDOW)
+    # False: answer 503 right away instead of waiting for the initial load
+    wait: bool = True
+    # True: answer with NDJSON, one line per day as soon as it's analyzed
+    stream: bool = False
+    # True: analyze the days in worker processes (not used when streaming)
+    parallel: bool = False
+
+def stream_days(request, dates_to_test, target_dates, mode="greedy", fill_rate_window=0):
+    """
+    Yields one JSON line per day that has data, in request order. Each day
+    is only analyzed when it's reached, so the first line goes out after
+    one day's work and nothing is held for the whole range. Stops as soon
+    as the client disconnects.
+    """
+    for position, (target_date_str, target_dt) in enumerate(zip(dates_to_test, target_dates)):
+        if client_disconnected(request):
+            record_cancellation(len(target_dates) - position)
+            return
+        day_summary = get_days([target_dt], mode=mode, fill_rate_window=fill_rate_window)[target_dt]
+        if day_summary is None:
+            print(f"No data found for {target_date_str}, skipping.")
+            continue
+        try:
+            yield result_encoder.dumps(day_summary) + b"\n"
+        except GeneratorExit:
+            # Starlette noticed the disconnect first and stopped reading
+            # (the generator is closed once it is garbage collected)
+            record_cancellation(len(target_dates) - position - 1)
+            raise
+
+@app.post("/query_days")
+def query_day(in_days: QDayData, request: Request):
+    # --- STEP 3: DEFINE THE DATES YOU WANT TO TEST ---
+    #
+    # THIS IS THE PART YOU CHANGE
+    # Instead of finding unique dates, just define your list.
+    # Use 'YYYY-MM-DD' format.
+    #
+    dates_to_test = in_days.days
+
+    if in_days.mode == "optimal" and not optimal_mode_available():
+        return JSONResponse(
+            status_code=501,
+            content={"detail": 'mode "optimal" needs scipy, which isn\'t installed on the server (pip install scipy); use mode "greedy"'},
+        )
+
+    if not wait_for_data(in_days.wait):
+        return not_ready_response()
+    sync_shared_store()
+    
+    # This list will hold our final report
+    all_results = []
+
+    target_dates = [pd.to_datetime(d).date() for d in dates_to_test]
+    if in_days.stream:
+        return StreamingResponse(
+            stream_days(request, dates_to_test, target_dates, in_days.mode, in_days.fill_rate_window),
+            media_type="application/x-ndjson",
+        )
+
+    # Only analyze the days that aren't cached (or being analyzed already),
+    # a batch at a time so a client that went away stops the work
+    # (the worker pool gets a chunk per task in each batch)
+    batch_size = CANCEL_CHECK_DAYS * (ANALYSIS_WORKERS * CHUNKS_PER_WORKER if in_days.parallel else 1)
+    day_results = {}
+    for start in range(0, len(target_dates), batch_size):
+        if client_disconnected(request):
+            record_cancellation(len(target_dates) - start)
+            return Response(status_code=499)  # Client Closed Request; nobody reads it
+        day_results.update(get_days(
+            target_dates[start:start + batch_size],
+            mode=in_days.mode,
+            fill_rate_window=in_days.fill_rate_window,
+            parallel=in_days.parallel,
+        ))
+
+    # --- STEP 4: COLLECT EACH DAY ---
+    for target_date_str, target_dt in zip(dates_to_test, target_dates):
+        day_summary = day_results[target_dt]
+        if day_summary is None:
+            print(f"No data found for {target_date_str}, skipping.")
+            continue
         all_results.append(day_summary)
 
     # --- STEP 5: REPORT THE FINDINGS ---
@@ -319,15 +1312,5 @@ def query_day(in_days: QDayData):
                 print(f"  - Event: Cauldron {event['cauldron_id']}, Total Drain: {event['total_drain']:.2f}L, Start: {event['start_time']}")
             # --- END DEBUG BLOCK ---
 
-    def serialize_item(item):
-        if isinstance(item, pd.Timestamp):
-            return item.isoformat()
-        elif isinstance(item, list):
-            return [serialize_item(i) for i in item]
-        elif isinstance(item, dict):
-            return {k: serialize_item(v) for k, v in item.items()}
-        else:
-            return item
-
-    serializable_results = [serialize_item(day) for day in all_results]
-    return JSONResponse(content=jsonable_encoder(serializable_results))
\ No newline at end of file
+    # Straight to JSON bytes in one pass (see result_encoder.py)
+    return Response(content=result_encoder.dumps(all_results), media_type="application/json")
\ No newline at end of file
@@ -0,0 +1,84 @@
+import copy
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Base URL for the hackathon API (set HACKUTD_API_BASE to point at a local stand-in)
+BASE_URL = os.environ.get("HACKUTD_API_BASE", "https://hackutd2025.eog.systems/api").rstrip("/")
+
+# (connect, read) timeouts in seconds for every request
+REQUEST_TIMEOUT = (10, 120)
+
+def make_session(pool_size: int = 8) -> requests.Session:
+    """
+    A keep-alive session with a connection pool, gzip and retries (with
+    backoff) on connection errors and 429/5xx responses.
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# One pooled session shared by every loader (and every thread)
+SESSION = make_session()
+
+# url -> (etag, last_modified, parsed body) for conditional requests
+_validators = {}
+_validators_lock = threading.Lock()
+
+def url_for(path: str) -> str:
+    return f"{BASE_URL}/{path.lstrip('/')}"
+
+def get(path: str, params: dict = None, stream: bool = False) -> requests.Response:
+    """
+    GET an API path over the shared session. Raises on HTTP errors.
+    """
+    response = SESSION.get(url_for(path), params=params, stream=stream, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()  # stop if there's a request error
+    return response
+
+def get_json(path: str, params: dict = None, conditional: bool = False):
+    """
+    GET an API path and parse the JSON body.
+
+    With conditional=True the ETag / Last-Modified of the last response are
+    sent back (If-None-Match / If-Modified-Since); on 304 Not Modified the
+    previously parsed body is returned without downloading it again.
+    """
+    if not conditional:
+        return get(path, params).json()
+
+    url = requests.Request("GET", url_for(path), params=params).prepare().url
+    with _validators_lock:
+        cached = _validators.get(url)
+
+    headers = {}
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = SESSION.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304 and cached is not None:
+        return copy.deepcopy(cached[2])
+    response.raise_for_status()
+
+    data = response.json()
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _validators_lock:
+            _validators[url] = (etag, last_modified, copy.deepcopy(data))
+    return data
@@ -1,51 +1,398 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
+import codecs
+import datetime
+import itertools
+import json
+import os
+import threading
 
-# Base URL for the hackathon API
-BASE_URL = "https://hackutd2025.eog.systems/api"
+try:
+    import fcntl
+except ImportError:  # Windows: snapshot updates are only serialized within a process
+    fcntl = None
 
-def fetch_cauldron_levels() -> pd.DataFrame:
+import api_client
+
+# Readings per column chunk when streaming the /Data download
+STREAM_CHUNK_ENTRIES = 5000
+
+# Ranged history fetches are split into windows of this length, with at
+# most MAX_PARALLEL_WINDOWS downloading at once. Very long ranges use
+# wider windows so they never take more than MAX_FETCH_WINDOWS requests.
+FETCH_WINDOW = datetime.timedelta(days=1)
+MAX_PARALLEL_WINDOWS = 4
+MAX_FETCH_WINDOWS = 32
+
+# Newest reading fetched so far, so refreshes only ask for what's new
+last_ingested_timestamp = None
+
+def flatten_level_chunk(entries: list, cauldron_codes: dict) -> tuple:
+    """
+    Flattens a run of /Data readings straight into preallocated NumPy
+    columns (one row per timestamp and cauldron) instead of one dict per
+    reading. New cauldron ids are added to `cauldron_codes`.
+    Returns (timestamps, codes, volumes) with timestamps as int64.
+    """
+    n_rows = sum(len(entry['cauldron_levels']) for entry in entries)
+    counts = np.empty(len(entries), dtype=np.int64)
+    codes = np.empty(n_rows, dtype=np.int16)
+    volumes = np.empty(n_rows, dtype=np.float32)
+
+    last_keys, last_codes = None, None
+    pos = 0
+    for i, entry in enumerate(entries):
+        levels = entry['cauldron_levels']
+        n = len(levels)
+
+        # Every reading usually lists the same cauldrons in the same order
+        keys = tuple(levels)
+        if keys != last_keys:
+            last_keys = keys
+            last_codes = [cauldron_codes.setdefault(cid, len(cauldron_codes)) for cid in keys]
+
+        codes[pos:pos + n] = last_codes
+        volumes[pos:pos + n] = list(levels.values())
+        counts[i] = n
+        pos += n
+
+    # CRITICAL: Convert timestamp strings to datetime objects
+    # (parsed once per reading, then repeated for each cauldron)
+    timestamps = pd.to_datetime([entry['timestamp'] for entry in entries], utc=True)
+    timestamp_values = np.repeat(timestamps.as_unit("ns").asi8, counts)
+
+    return timestamp_values, codes, volumes
+
+def build_levels_frame(chunks: list, cauldron_codes: dict) -> pd.DataFrame:
+    """
+    Stitches flattened column chunks into the long levels DataFrame.
+    cauldron_id is categorical and volume is float32.
+    """
+    if chunks:
+        timestamp_values, codes, volumes = (np.concatenate(parts) for parts in zip(*chunks))
+    else:
+        timestamp_values = np.array([], dtype=np.int64)
+        codes = np.array([], dtype=np.int16)
+        volumes = np.array([], dtype=np.float32)
+
+    # Categories in sorted order so sorting by cauldron_id stays alphabetical
+    cauldron_ids = sorted(cauldron_codes)
+    remap = np.empty(len(cauldron_ids), dtype=np.int16)
+    for new_code, cid in enumerate(cauldron_ids):
+        remap[cauldron_codes[cid]] = new_code
+
+    return pd.DataFrame({
+        "timestamp": pd.DatetimeIndex(timestamp_values, dtype="datetime64[ns, UTC]"),
+        "cauldron_id": pd.Categorical.from_codes(remap[codes], categories=cauldron_ids),
+        "volume": volumes  # Renaming to 'volume' to match our analysis code
+    })
+
+def flatten_cauldron_levels(json_data: list) -> pd.DataFrame:
+    """
+    Flattens the full nested /Data JSON into the long levels DataFrame.
+    """
+    cauldron_codes = {}
+    chunk = flatten_level_chunk(json_data, cauldron_codes)
+    return build_levels_frame([chunk], cauldron_codes)
+
+def iter_json_array(byte_chunks):
+    """
+    Incrementally parses a top-level JSON array from an iterable of byte
+    chunks, yielding one element at a time.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos = '', 0
+    opened = False
+
+    for chunk in itertools.chain(byte_chunks, [None]):
+        final = chunk is None
+        buffer = buffer[pos:] + text_decoder.decode(chunk or b'', final=final)
+        pos = 0
+
+        while True:
+            # Skip whitespace and the commas between elements
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer):
+                break
+
+            if not opened:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                opened = True
+                pos += 1
+                continue
+
+            if buffer[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # element isn't complete yet, wait for more bytes
+
+            # Only trust the value once the delimiter after it has arrived
+            # (e.g. "12" could still be the start of "12.5e3")
+            if not final and (end >= len(buffer) or buffer[end] not in ' \t\r\n,]'):
+                break
+
+            yield item
+            pos = end
+
+    raise ValueError("Truncated JSON array")
+
+def _download_levels(params: dict, stream: bool, chunk_entries: int) -> pd.DataFrame:
+    """
+    Downloads and flattens one /Data response.
+    """
+    cauldron_codes = {}
+
+    if stream:
+        chunks = []
+        with api_client.get("Data/", params, stream=True) as response:
+            entries = []
+            for entry in iter_json_array(response.iter_content(chunk_size=1 << 16)):
+                entries.append(entry)
+                if len(entries) >= chunk_entries:
+                    chunks.append(flatten_level_chunk(entries, cauldron_codes))
+                    entries = []
+            if entries:
+                chunks.append(flatten_level_chunk(entries, cauldron_codes))
+        return build_levels_frame(chunks, cauldron_codes)
+
+    json_data = api_client.get_json("Data/", params)
+    return flatten_cauldron_levels(json_data)
+
+def _remember_newest(df: pd.DataFrame):
+    global last_ingested_timestamp
+    if not df.empty:
+        newest = df['timestamp'].max()
+        if last_ingested_timestamp is None or newest > last_ingested_timestamp:
+            last_ingested_timestamp = newest
+
+def fetch_cauldron_levels(stream: bool = False, chunk_entries: int = STREAM_CHUNK_ENTRIES,
+                          start_date: int = 0, end_date: int = 2000000000) -> pd.DataFrame:
     """
-    Fetches the minute-by-minute cauldron level data.
+    Fetches the minute-by-minute cauldron level data between two Unix
+    timestamps (the full history by default) in a single request.
     This uses the CORRECT logic to flatten the nested JSON.
+
+    With stream=True the response body is parsed incrementally and flattened
+    every `chunk_entries` readings, so the raw payload and the parsed JSON
+    are never held in memory all at once.
     """
     print("Fetching cauldron levels...")
-    url = f"{BASE_URL}/Data/?start_date=0&end_date=2000000000"
-    response = requests.get(url)
-    response.raise_for_status()  # stop if there's a request error
-    json_data = response.json()
-
-    # Flatten the JSON into a list of records
-    records = []
-    for entry in json_data:
-        timestamp = entry['timestamp']
-        for cauldron_id, level in entry['cauldron_levels'].items():
-            records.append({
-                "timestamp": timestamp,
-                "cauldron_id": cauldron_id,
-                "volume": level  # Renaming to 'volume' to match our analysis code
-            })
-
-    df = pd.DataFrame(records)
-    
-    # CRITICAL: Convert timestamp strings to datetime objects
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
+    df = _download_levels({"start_date": start_date, "end_date": end_date}, stream, chunk_entries)
     print(f"Cauldron levels fetched. (Total {len(df)} records)")
+    _remember_newest(df)
     
     # Return the "long" DataFrame. DO NOT PIVOT.
     return df
 
+def to_unix_seconds(value) -> int:
+    """
+    Unix seconds for an int, a date string, a date or a datetime
+    (naive values are taken as UTC).
+    """
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.timestamp())
+
+def fetch_cauldron_levels_range(start, end=None, window: datetime.timedelta = FETCH_WINDOW,
+                                max_workers: int = MAX_PARALLEL_WINDOWS) -> pd.DataFrame:
+    """
+    Fetches the readings between `start` and `end` (now by default), given
+    as Unix seconds, dates or datetimes.
+
+    The range is split into fixed windows that download in parallel (at
+    most `max_workers` at a time) and are stitched back together in time
+    order, so a long range never waits on one huge response.
+    """
+    start_date = to_unix_seconds(start)
+    end_date = to_unix_seconds(end if end is not None else _now())
+    span = max(end_date - start_date, 0)
+    step = max(int(window.total_seconds()), -(-span // MAX_FETCH_WINDOWS), 1)
+    bounds = list(range(start_date, end_date, step)) + [end_date]
+    if len(bounds) == 1:
+        bounds.append(end_date)
+    windows = list(zip(bounds[:-1], bounds[1:]))
+
+    print(f"Fetching cauldron levels in {len(windows)} window(s)...")
+
+    def fetch_window(window_bounds):
+        window_start, window_end = window_bounds
+        df = _download_levels({"start_date": window_start, "end_date": window_end},
+                              stream=True, chunk_entries=STREAM_CHUNK_ENTRIES)
+        # end_date is inclusive, so a reading on the boundary belongs to the next window
+        if window_end != end_date:
+            df = df[df['timestamp'].array.asi8 < window_end * 1_000_000_000]
+        return df
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        frames = list(pool.map(fetch_window, windows))
+
+    df = concat_cauldron_levels(frames)
+    print(f"Cauldron levels fetched. (Total {len(df)} records)")
+    _remember_newest(df)
+    return df
+
+def fetch_new_cauldron_levels(since: pd.Timestamp = None) -> pd.DataFrame:
+    """
+    Fetches only the readings newer than `since` (by default the newest
+    reading fetched so far) instead of re-downloading the whole history.
+    """
+    if since is None:
+        since = last_ingested_timestamp
+    if since is None:
+        return fetch_cauldron_levels(stream=True)
+
+    # A long gap (e.g. after downtime) is fetched window by window.
+    # start_date has one-second resolution, so drop what we already have
+    df = fetch_cauldron_levels_range(int(since.timestamp()))
+    return df[df['timestamp'] > since].reset_index(drop=True)
+
+def concat_cauldron_levels(frames: list) -> pd.DataFrame:
+    """
+    Concatenates levels DataFrames in order, keeping cauldron_id
+    categorical (and its categories sorted).
+    """
+    if not frames:
+        return build_levels_frame([], {})
+    categories = sorted(set().union(*(frame['cauldron_id'].cat.categories for frame in frames)))
+    frames = [frame.assign(cauldron_id=frame['cauldron_id'].cat.set_categories(categories)) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def append_cauldron_levels(df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Appends newly fetched readings to a levels DataFrame.
+    """
+    return concat_cauldron_levels([df, new_df])
+
+# --- Level matrix ---
+# The level history is kept once per process as a dense timestamp x
+# cauldron float32 matrix (what the predictive model works on); the long
+# one-row-per-reading frame analysis.py uses is derived from it.
+_level_matrix = None
+_level_matrix_lock = threading.Lock()
+
+def _matrix_frame(values: np.ndarray, timestamp_values: np.ndarray, cauldron_ids: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        values,
+        index=pd.DatetimeIndex(timestamp_values, dtype="datetime64[ns, UTC]", name="timestamp"),
+        columns=pd.Index(cauldron_ids, name="cauldron_id"),
+        copy=False,
+    )
+
+def is_level_matrix(df: pd.DataFrame) -> bool:
+    return isinstance(df.index, pd.DatetimeIndex)
+
+def levels_to_matrix(levels: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turns a long levels DataFrame into the wide matrix: one row per
+    timestamp (sorted), one float32 column per cauldron, NaN where a
+    cauldron has no reading.
+    """
+    if is_level_matrix(levels):
+        return levels
+    cauldron_ids = [str(c) for c in levels['cauldron_id'].cat.categories]
+    timestamp_values = levels['timestamp'].dt.as_unit("ns").array.asi8
+    times, rows = np.unique(timestamp_values, return_inverse=True)
+
+    values = np.full((len(times), len(cauldron_ids)), np.nan, dtype=np.float32)
+    values[rows, levels['cauldron_id'].cat.codes.to_numpy()] = levels['volume'].to_numpy(dtype=np.float32)
+    return _matrix_frame(values, times, cauldron_ids)
+
+def matrix_to_levels(matrix: pd.DataFrame) -> pd.DataFrame:
+    """
+    The long view of a level matrix (timestamp, categorical cauldron_id,
+    volume), ordered by time and then cauldron. When every cauldron has a
+    reading at every timestamp the volume column is a view of the matrix.
+    """
+    values = np.ascontiguousarray(matrix.to_numpy(dtype=np.float32))
+    n_times, n_cauldrons = values.shape
+
+    timestamp_values = np.repeat(matrix.index.as_unit("ns").asi8, n_cauldrons)
+    codes = np.tile(np.arange(n_cauldrons, dtype=np.int16), n_times)
+    volumes = values.reshape(-1)
+
+    present = ~np.isnan(volumes)
+    if not present.all():
+        timestamp_values, codes, volumes = timestamp_values[present], codes[present], volumes[present]
+
+    return pd.DataFrame({
+        "timestamp": pd.DatetimeIndex(timestamp_values, dtype="datetime64[ns, UTC]"),
+        "cauldron_id": pd.Categorical.from_codes(codes, categories=list(matrix.columns)),
+        "volume": volumes,
+    }, copy=False)
+
+def concat_level_matrices(matrices: list) -> pd.DataFrame:
+    """
+    Stacks level matrices in time order, widening to the union of their
+    cauldrons (sorted). A timestamp that appears in more than one matrix
+    (overlapping snapshot parts) is kept once, from the last matrix.
+    """
+    matrices = [m for m in matrices if len(m)] or matrices[:1]
+    if not matrices:
+        return _matrix_frame(np.empty((0, 0), dtype=np.float32), np.array([], dtype=np.int64), [])
+    cauldron_ids = sorted(set().union(*(m.columns for m in matrices)))
+    combined = pd.concat([m.reindex(columns=cauldron_ids) for m in matrices]).sort_index(kind="stable")
+    combined = combined[~combined.index.duplicated(keep="last")]
+    values = np.ascontiguousarray(combined.to_numpy(dtype=np.float32))
+    return _matrix_frame(values, combined.index.as_unit("ns").asi8, cauldron_ids)
+
+def set_level_matrix(matrix: pd.DataFrame) -> pd.DataFrame:
+    global _level_matrix
+    with _level_matrix_lock:
+        _level_matrix = matrix
+    return matrix
+
+def extend_level_matrix(new_levels: pd.DataFrame) -> pd.DataFrame:
+    """
+    Appends newly fetched readings to this process's level matrix.
+    """
+    global _level_matrix
+    with _level_matrix_lock:
+        if _level_matrix is not None and not new_levels.empty:
+            _level_matrix = concat_level_matrices([_level_matrix, levels_to_matrix(new_levels)])
+        return _level_matrix
+
+def get_level_matrix(use_snapshot: bool = True, directory: str = None) -> pd.DataFrame:
+    """
+    The level matrix this process already loaded, or else the snapshot
+    plus the readings after it (a full download if there's no snapshot).
+    The long view isn't built unless something asks for it.
+    """
+    with _level_matrix_lock:
+        matrix = _level_matrix
+    if matrix is None:
+        matrix = set_level_matrix(load_level_matrix(use_snapshot, directory or SNAPSHOT_DIR))
+    return matrix
+
+def compact_tickets(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Stores the ids that repeat across tickets (cauldron, courier) as
+    categoricals instead of one Python string per row.
+    """
+    for column in ('cauldron_id', 'courier_id'):
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    return df
+
 def fetch_tickets() -> pd.DataFrame:
     """
     Fetches all transport tickets.
     """
     print("Fetching tickets...")
-    url = f"{BASE_URL}/Tickets"
-    response = requests.get(url)
-    response.raise_for_status()
-    
-    tickets_response = response.json()
+    # Conditional request: an unchanged ticket list isn't downloaded again
+    tickets_response = api_client.get_json("Tickets", conditional=True)
     # Check if 'transport_tickets' key exists, otherwise use the root list
     if 'transport_tickets' in tickets_response:
         tickets = tickets_response.get("transport_tickets", [])
@@ -57,22 +404,263 @@ def fetch_tickets() -> pd.DataFrame:
     # CRITICAL: Convert date strings to datetime objects
     df['date'] = pd.to_datetime(df['date'])
     print("Tickets fetched.")
-    return df
+    return compact_tickets(df)
 
 def fetch_cauldron_info() -> pd.DataFrame:
     """
     Fetches the static info about each cauldron (name, location, etc.)
     """
     print("Fetching cauldron info...")
-    url = f"{BASE_URL}/Information/cauldrons"
-    response = requests.get(url)
-    response.raise_for_status()
-    
-    data = response.json()
+    data = api_client.get_json("Information/cauldrons", conditional=True)
     df = pd.DataFrame(data)
     print("Cauldron info fetched.")
     return df
 
+# --- Local snapshot ---
+# Fetched frames are kept on disk as Parquet files plus a manifest.json
+# recording what they cover, so a restart only downloads the missing tail.
+# Levels are stored as the wide level matrix (one column per cauldron).
+SNAPSHOT_DIR = os.environ.get("HACKUTD_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshot"))
+
+# Tickets can change for past days, so only reuse recently fetched ones
+TICKETS_MAX_AGE = datetime.timedelta(minutes=10)
+
+# Compact the levels back into one file once there are this many parts
+MAX_LEVEL_PARTS = 20
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def read_manifest(directory: str = SNAPSHOT_DIR) -> dict:
+    try:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_manifest(manifest: dict, directory: str):
+    tmp_path = os.path.join(directory, "manifest.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, "manifest.json"))
+
+# Serializes manifest updates between threads; _locked_snapshot adds a
+# file lock so other processes (uvicorn workers, the forecast) wait too
+_snapshot_lock = threading.RLock()
+
+@contextmanager
+def _locked_snapshot(directory: str):
+    with _snapshot_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "snapshot.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+def _write_parquet(df: pd.DataFrame, directory: str, name: str):
+    tmp_path = os.path.join(directory, name + ".tmp")
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+def _write_levels_part(levels: pd.DataFrame, directory: str) -> tuple:
+    """
+    Writes levels (long or already a matrix) as one wide Parquet part.
+    Returns (file name, matrix).
+    """
+    matrix = levels_to_matrix(levels)
+    name = f"levels-{_now().isoformat().replace(':', '')}.parquet"
+    _write_parquet(matrix.reset_index(), directory, name)
+    return name, matrix
+
+def _read_levels_part(path: str) -> pd.DataFrame:
+    part = pd.read_parquet(path)
+    if 'cauldron_id' in part.columns:
+        return levels_to_matrix(part)  # written by an older version in long format
+    part = part.set_index('timestamp')
+    part.columns.name = 'cauldron_id'
+    return part
+
+def save_snapshot(levels: pd.DataFrame = None, tickets: pd.DataFrame = None, directory: str = SNAPSHOT_DIR) -> bool:
+    """
+    Rewrites the given frames in the snapshot (`levels` may be long or a
+    level matrix). Returns False if the snapshot couldn't be written (e.g.
+    no Parquet engine installed).
+    """
+    with _locked_snapshot(directory):
+        return _save_snapshot(levels, tickets, directory)
+
+def _save_snapshot(levels, tickets, directory) -> bool:
+    try:
+        os.makedirs(directory, exist_ok=True)
+        manifest = read_manifest(directory)
+        fetched_at = _now().isoformat()
+
+        if levels is not None:
+            old_parts = manifest.get("levels", {}).get("parts", [])
+            name, matrix = _write_levels_part(levels, directory)
+            manifest["levels"] = {
+                "parts": [name],
+                "start": matrix.index.min().isoformat() if len(matrix) else None,
+                "end": matrix.index.max().isoformat() if len(matrix) else None,
+                "rows": len(matrix),
+                "fetched_at": fetched_at,
+            }
+        if tickets is not None:
+            _write_parquet(tickets, directory, "tickets.parquet")
+            manifest["tickets"] = {"file": "tickets.parquet", "rows": len(tickets), "fetched_at": fetched_at}
+
+        _write_manifest(manifest, directory)
+    except (ImportError, OSError) as e:
+        print(f"Couldn't write snapshot: {e}")
+        return False
+
+    # Old level files are only removed once the manifest no longer points at them
+    if levels is not None:
+        for name in old_parts:
+            if name not in manifest["levels"]["parts"]:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+    return True
+
+def append_levels_snapshot(new_levels: pd.DataFrame, directory: str = SNAPSHOT_DIR) -> bool:
+    """
+    Adds newly fetched readings to the snapshot as one more Parquet part
+    instead of rewriting the whole history. Readings the snapshot already
+    covers (e.g. appended by another process meanwhile) are left out.
+    """
+    with _locked_snapshot(directory):
+        return _append_levels_snapshot(new_levels, directory)
+
+def _append_levels_snapshot(new_levels: pd.DataFrame, directory: str) -> bool:
+    manifest = read_manifest(directory)
+    levels_info = manifest.get("levels")
+    if levels_info is None:
+        return _save_snapshot(new_levels, None, directory)
+
+    matrix = levels_to_matrix(new_levels)
+    if levels_info["end"]:
+        matrix = matrix[matrix.index > pd.Timestamp(levels_info["end"])]
+    if matrix.empty:
+        return True
+
+    try:
+        fetched_at = _now().isoformat()
+        name, matrix = _write_levels_part(matrix, directory)
+        levels_info["parts"].append(name)
+        new_end = matrix.index.max()
+        if levels_info["end"]:
+            new_end = max(new_end, pd.Timestamp(levels_info["end"]))
+        levels_info["end"] = new_end.isoformat()
+        levels_info["start"] = levels_info["start"] or matrix.index.min().isoformat()
+        levels_info["rows"] += len(matrix)
+        levels_info["fetched_at"] = fetched_at
+        _write_manifest(manifest, directory)
+    except (ImportError, OSError) as e:
+        print(f"Couldn't write snapshot: {e}")
+        return False
+
+    if len(levels_info["parts"]) > MAX_LEVEL_PARTS:
+        snapshot = _load_snapshot(directory)
+        if snapshot is not None:
+            _save_snapshot(snapshot["matrix"], None, directory)
+    return True
+
+def load_snapshot(directory: str = SNAPSHOT_DIR) -> dict:
+    """
+    Reads the snapshot's levels back. Returns {"manifest", "matrix"}, or
+    None if there's no usable snapshot (see load_tickets for the tickets).
+    """
+    with _locked_snapshot(directory):
+        return _load_snapshot(directory)
+
+def _load_snapshot(directory: str) -> dict:
+    manifest = read_manifest(directory)
+    if "levels" not in manifest:
+        return None
+
+    try:
+        parts = [_read_levels_part(os.path.join(directory, name)) for name in manifest["levels"]["parts"]]
+        matrix = concat_level_matrices(parts)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Couldn't read snapshot: {e}")
+        return None
+
+    return {"manifest": manifest, "matrix": matrix}
+
+def load_level_matrix(use_snapshot: bool = True, directory: str = SNAPSHOT_DIR) -> pd.DataFrame:
+    """
+    Loads the level history as a level matrix, starting from the local
+    snapshot when there is one and only downloading the readings after it.
+    Saves what was fetched back into the snapshot.
+    """
+    global last_ingested_timestamp
+    snapshot = load_snapshot(directory) if use_snapshot else None
+
+    if snapshot is None:
+        matrix = levels_to_matrix(fetch_cauldron_levels(stream=True))
+        if use_snapshot:
+            save_snapshot(levels=matrix, directory=directory)
+        return matrix
+
+    manifest = snapshot["manifest"]
+    matrix = snapshot["matrix"]
+    print(f"Loaded {len(matrix)} x {len(matrix.columns)} cauldron level matrix from snapshot (up to {manifest['levels']['end']}).")
+
+    if matrix.empty:
+        new_levels = fetch_cauldron_levels(stream=True)
+    else:
+        last_ingested_timestamp = matrix.index[-1]
+        new_levels = fetch_new_cauldron_levels(last_ingested_timestamp)
+
+    if not new_levels.empty:
+        matrix = concat_level_matrices([matrix, levels_to_matrix(new_levels)])
+        append_levels_snapshot(new_levels, directory)
+    return matrix
+
+def load_levels(use_snapshot: bool = True, directory: str = SNAPSHOT_DIR, keep_matrix: bool = True) -> pd.DataFrame:
+    """
+    Loads the level history (see load_level_matrix) and returns the long
+    view. With keep_matrix=True the matrix becomes this process's level
+    matrix; a server that moves the levels into the shared store passes
+    False so the matrix is freed once the store is written.
+    """
+    matrix = load_level_matrix(use_snapshot, directory)
+    if keep_matrix:
+        set_level_matrix(matrix)
+    return matrix_to_levels(matrix)
+
+def fetch_levels_and_tickets(use_snapshot: bool = True, directory: str = SNAPSHOT_DIR) -> tuple:
+    """
+    Loads the levels (see load_levels) and the tickets side by side.
+    Returns (long levels, tickets).
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        tickets_future = pool.submit(load_tickets, use_snapshot, directory)
+        levels = load_levels(use_snapshot, directory)
+        tickets = tickets_future.result()
+    return levels, tickets
+
+def load_tickets(use_snapshot: bool = True, directory: str = SNAPSHOT_DIR) -> pd.DataFrame:
+    """
+    The tickets, from the snapshot if they were fetched within
+    TICKETS_MAX_AGE, otherwise freshly fetched (and saved).
+    """
+    tickets_info = read_manifest(directory).get("tickets") if use_snapshot else None
+    if tickets_info and _now() - datetime.datetime.fromisoformat(tickets_info["fetched_at"]) <= TICKETS_MAX_AGE:
+        try:
+            return compact_tickets(pd.read_parquet(os.path.join(directory, tickets_info["file"])))
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Couldn't read snapshot: {e}")
+
+    tickets = fetch_tickets()
+    if use_snapshot:
+        save_snapshot(tickets=tickets, directory=directory)
+    return tickets
+
 # You can run this file by itself to test it
 # if __name__ == "__main__":
 #     df_levels = fetch_cauldron_levels()
@@ -1,13 +1,7 @@
-import requests
+import api_client
 
-BASE = "https://hackutd2025.eog.systems/api/Information"
-resp = requests.get(f"{BASE}/cauldrons")
-resp.raise_for_status()
-cauldrons = resp.json()
-
-resp = requests.get(f"{BASE}/network")
-resp.raise_for_status()
-edges = resp.json().get("edges") or []
+cauldrons = api_client.get_json("Information/cauldrons", conditional=True)
+edges = api_client.get_json("Information/network", conditional=True).get("edges") or []
 
 graph = [[0 for i in range(len(cauldrons) + 1)] for j in range(len(cauldrons) + 1)]
 
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+# Positive deltas (filling minutes) are counted in log-spaced buckets, so
+# a quantile read from the counts is within 0.1% of the true value.
+# Counts of different days merge by adding them up, so a rolling window
+# never has to look at the readings again.
+RELATIVE_ACCURACY = 0.001
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = np.log(GAMMA)
+
+# Deltas outside this range (L/min) are clamped into the first / last bucket
+MIN_RATE = 1e-4
+MAX_RATE = 1e5
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+
+def bucket_of(values: np.ndarray) -> np.ndarray:
+    values = np.clip(values, MIN_RATE, MAX_RATE)
+    return np.ceil(np.log(values) / LOG_GAMMA).astype(np.int32)
+
+def bucket_value(buckets: np.ndarray) -> np.ndarray:
+    """
+    The value a bucket stands for (within RELATIVE_ACCURACY of anything in it).
+    """
+    return 2 * GAMMA ** buckets.astype(np.float64) / (GAMMA + 1)
+
+def day_numbers(timestamps: pd.Series) -> np.ndarray:
+    """
+    UTC days since the epoch of each timestamp.
+    """
+    return timestamps.dt.as_unit("ns").array.asi8 // NS_PER_DAY
+
+def build_sketches(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sketches the fill rate of every (day, cauldron) in `df` (which needs
+    'observed_delta'): how many of its positive deltas fall in each bucket.
+    Returns one row per non-empty bucket: day, cauldron_id, bucket, count.
+    """
+    delta = df['observed_delta'].to_numpy(dtype=np.float64)
+    filling = np.flatnonzero(delta > 0)
+
+    cauldron_ids = np.asarray(df['cauldron_id'].cat.categories.astype(str), dtype=object)
+    table = pd.DataFrame({
+        'day': day_numbers(df['timestamp'].iloc[filling]),
+        'cauldron_id': cauldron_ids[df['cauldron_id'].cat.codes.to_numpy()[filling]],
+        'bucket': bucket_of(delta[filling]),
+    })
+    counts = table.groupby(['day', 'cauldron_id', 'bucket'], sort=True).size()
+    return counts.rename('count').reset_index()
+
+def update_sketches(sketches: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Brings sketches up to date with `df` (time-sorted, and an extension of
+    the history the sketches were built from): the last sketched day
+    (which may have been partial) and everything after it are re-sketched.
+    """
+    if sketches.empty:
+        return build_sketches(df)
+    last_day = sketches['day'].iloc[-1]
+    start = np.searchsorted(df['timestamp'].dt.as_unit("ns").array.asi8, last_day * NS_PER_DAY)
+    new_sketches = build_sketches(df.iloc[start:])
+    return pd.concat([sketches[sketches['day'] < last_day], new_sketches], ignore_index=True)
+
+def rolling_fill_rates(sketches: pd.DataFrame, window: int, fallback: pd.Series,
+                       first_day: int, last_day: int) -> pd.DataFrame:
+    """
+    The median fill rate of each cauldron over the `window` days ending
+    on each day from first_day to last_day (day numbers). A cauldron that
+    didn't fill at all in a window gets its `fallback` rate.
+    Returns a day x cauldron grid (index: day number, columns: cauldron_id).
+    """
+    days = np.arange(first_day, last_day + 1)
+    cauldron_ids = sorted(set(sketches['cauldron_id']) | set(fallback.index))
+    fallback_rates = fallback.reindex(cauldron_ids).fillna(0).to_numpy(dtype=np.float64)
+    rates = np.tile(fallback_rates, (len(days), 1))
+
+    in_range = sketches[(sketches['day'] >= first_day - window + 1) & (sketches['day'] <= last_day)]
+    for position, cauldron_id in enumerate(cauldron_ids):
+        sketch = in_range[in_range['cauldron_id'] == cauldron_id]
+        if sketch.empty:
+            continue
+
+        # Counts per (day, bucket) over just the buckets this cauldron uses,
+        # starting window - 1 days early
+        buckets, bucket_positions = np.unique(sketch['bucket'].to_numpy(), return_inverse=True)
+        day_offset = first_day - window + 1
+        counts = np.zeros((len(days) + window - 1, len(buckets)), dtype=np.int64)
+        counts[sketch['day'].to_numpy() - day_offset, bucket_positions] = sketch['count'].to_numpy()
+
+        # Merge each day's window by differencing cumulative counts
+        cumulative = np.cumsum(counts, axis=0)
+        windowed = cumulative[window - 1:].copy()
+        windowed[1:] -= cumulative[:len(days) - 1]
+
+        # The (lower) median's bucket: the first whose running count passes half
+        total = windowed.sum(axis=1)
+        running = np.cumsum(windowed, axis=1)
+        median_bucket = (running <= ((total - 1) // 2)[:, None]).sum(axis=1)
+
+        has_data = total > 0
+        rates[has_data, position] = bucket_value(buckets[median_bucket[has_data]])
+
+    return pd.DataFrame(rates, index=pd.Index(days, name='day'), columns=pd.Index(cauldron_ids, name='cauldron_id'))
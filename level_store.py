@@ -0,0 +1,181 @@
+import datetime
+import json
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no file locks, every worker loads its own copy
+    fcntl = None
+
+import api_loader
+
+# Where the shared level history lives (next to the api_loader snapshot)
+STORE_DIR = os.environ.get("HACKUTD_STORE_DIR", os.path.join(api_loader.SNAPSHOT_DIR, "store"))
+
+# Columns kept in the store and their on-disk dtypes
+# (cauldron_id is stored as its categorical codes; the per-cauldron fill
+# rates are small and live in meta.json)
+STORE_COLUMNS = {
+    "timestamp": np.int64,
+    "cauldron_id": None,
+    "volume": np.float32,
+    "observed_delta": np.float32,
+}
+
+# Bump when the stored columns or the way they're derived (observed_delta,
+# fill rates) change, so a store written by older code is rebuilt
+STORE_VERSION = 2
+
+# Workers of one run start within moments of each other; a store older
+# than this is treated as left over from an earlier run and rebuilt
+STORE_REUSE_WINDOW = datetime.timedelta(minutes=5)
+
+def current_run_id() -> str:
+    """
+    Identifies one server run. uvicorn workers are siblings, so they share
+    their parent's pid; analysis.py also exports HACKUTD_RUN_ID before
+    starting uvicorn.
+    """
+    return os.environ.get("HACKUTD_RUN_ID") or str(os.getppid())
+
+def available() -> bool:
+    return fcntl is not None
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # alive, just not ours
+    return True
+
+def read_meta(directory: str = STORE_DIR) -> dict:
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def read_fill_rates(meta: dict) -> pd.Series:
+    return pd.Series(meta["fill_rates"], dtype=np.float64, name="fill_rate").rename_axis("cauldron_id")
+
+def write_store(df: pd.DataFrame, fill_rates: pd.Series, directory: str = STORE_DIR) -> dict:
+    """
+    Writes the analyzed level history as one .npy file per column under a
+    new generation number, then points meta.json at it.
+    """
+    os.makedirs(directory, exist_ok=True)
+    old_meta = read_meta(directory)
+    generation = old_meta.get("generation", 0) + 1
+
+    files = {}
+    for column, dtype in STORE_COLUMNS.items():
+        if column == "timestamp":
+            values = df[column].dt.tz_convert("UTC").dt.as_unit("ns").array.asi8
+        elif column == "cauldron_id":
+            values = df[column].cat.codes.to_numpy()
+        else:
+            values = df[column].to_numpy(dtype=dtype)
+
+        name = f"{column}-{generation}.npy"
+        tmp_path = os.path.join(directory, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp_path, os.path.join(directory, name))
+        files[column] = name
+
+    meta = {
+        "generation": generation,
+        "version": STORE_VERSION,
+        "run_id": current_run_id(),
+        "writer_pid": os.getpid(),
+        "rows": len(df),
+        "categories": [str(c) for c in df["cauldron_id"].cat.categories],
+        "fill_rates": {str(cid): float(rate) for cid, rate in fill_rates.items()},
+        "files": files,
+        "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    tmp_path = os.path.join(directory, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+    # Workers still mapping the old generation keep their pages until they remap
+    for name in old_meta.get("files", {}).values():
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+    return meta
+
+def open_store(directory: str = STORE_DIR, meta: dict = None) -> pd.DataFrame:
+    """
+    Maps the stored level history read-only. The DataFrame's columns are
+    views of the mapped files, so every process shares the same pages.
+    """
+    meta = meta or read_meta(directory)
+    arrays = {
+        column: np.load(os.path.join(directory, name), mmap_mode="r")
+        for column, name in meta["files"].items()
+    }
+    columns = {
+        "timestamp": pd.Series(arrays["timestamp"], dtype="datetime64[ns, UTC]", copy=False),
+        "cauldron_id": pd.Series(
+            pd.Categorical.from_codes(arrays["cauldron_id"], categories=meta["categories"], validate=False),
+            copy=False,
+        ),
+    }
+    for column in STORE_COLUMNS:
+        if column not in columns:
+            columns[column] = pd.Series(arrays[column], copy=False)
+    return pd.DataFrame(columns, copy=False)
+
+def is_reusable(meta: dict) -> bool:
+    """
+    True if the store was written by this run (recently enough to be
+    trusted) with the current store layout. The process that wrote it must
+    still be running: a sibling worker is, while the process a --reload
+    replaced (or an earlier server started from the same shell, which has
+    the same parent) isn't.
+    """
+    if meta.get("version") != STORE_VERSION or meta.get("run_id") != current_run_id():
+        return False
+    if not meta.get("writer_pid") or not process_alive(meta["writer_pid"]):
+        return False
+    built_at = datetime.datetime.fromisoformat(meta["built_at"])
+    return datetime.datetime.now(datetime.timezone.utc) - built_at <= STORE_REUSE_WINDOW
+
+def _locked(directory: str):
+    os.makedirs(directory, exist_ok=True)
+    lock = open(os.path.join(directory, "build.lock"), "w")
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+def publish(df: pd.DataFrame, fill_rates: pd.Series, directory: str = STORE_DIR) -> tuple:
+    """
+    Replaces the store with a new generation (e.g. after a refresh) and
+    maps it. Returns (meta, mapped DataFrame).
+    """
+    with _locked(directory):
+        meta = write_store(df, fill_rates, directory)
+    return meta, open_store(directory, meta)
+
+def attach_or_build(build, directory: str = STORE_DIR) -> tuple:
+    """
+    Maps the store if another worker of this run already built it;
+    otherwise calls build() (which returns the analyzed levels and their
+    fill rates), writes the store and maps it. A file lock makes the other
+    workers wait for the first one instead of all fetching from the API.
+    Returns (meta, mapped DataFrame).
+    """
+    with _locked(directory):
+        meta = read_meta(directory)
+        if is_reusable(meta):
+            print(f"Mapping shared level store (generation {meta['generation']}, {meta['rows']} rows).")
+        else:
+            meta = write_store(*build(), directory)
+            print(f"Wrote shared level store (generation {meta['generation']}, {meta['rows']} rows).")
+    return meta, open_store(directory, meta)
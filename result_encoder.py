@@ -0,0 +1,130 @@
+import datetime
+import json
+import math
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # falls back to the standard library encoder
+    orjson = None
+
+def _default(obj):
+    """
+    Encodes what the JSON encoder doesn't know natively: pandas
+    Timestamps (as isoformat, like serialize_item did), dates and NumPy
+    scalars/arrays.
+    """
+    if isinstance(obj, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def _finite(obj):
+    """
+    Replaces NaN / infinity with None, which is what orjson writes for
+    them; the standard library encoder would emit bare NaN / Infinity,
+    which isn't valid JSON.
+    """
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    if isinstance(obj, np.ndarray):
+        return _finite(obj.tolist())
+    if isinstance(obj, (float, np.floating)):
+        return float(obj) if math.isfinite(obj) else None
+    return obj
+
+def dumps(obj) -> bytes:
+    """
+    Encodes day results (nested dicts / lists holding Timestamps, dates and
+    NumPy scalars) straight to JSON bytes in one pass. Non-finite floats
+    come out as null with either encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_finite(obj), default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+# --- Benchmark ---
+# python result_encoder.py [days]
+# Encodes a synthetic full-history response (day results shaped like
+# analyze_days' output) with the old serialize_item + jsonable_encoder +
+# json.dumps path and with dumps().
+def _sample_days(n_days: int, tickets_per_day: int = 20, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-01-01", tz="UTC")
+    days = []
+    for i in range(n_days):
+        day_start = start + pd.Timedelta(days=i)
+        pairs, flagged, unlogged = [], [], []
+        for j in range(tickets_per_day):
+            ticket = {
+                "ticket_id": f"TT_{i:04d}_{j:02d}",
+                "cauldron_id": f"cauldron_{j % 12 + 1:03d}",
+                "amount_collected": round(float(rng.uniform(50, 500)), 2),
+                "courier_id": f"courier_witch_{j % 5 + 1:02d}",
+                "date": day_start,
+            }
+            event = {
+                "cauldron_id": ticket["cauldron_id"],
+                "start_time": day_start + pd.Timedelta(minutes=int(rng.integers(0, 1440))),
+                "total_drain": float(rng.uniform(50, 500)),
+            }
+            if j % 7 == 0:
+                flagged.append(ticket)
+                unlogged.append(event)
+            else:
+                pairs.append({"ticket": ticket, "event": event})
+        days.append({
+            "date": day_start.date(),
+            "total_discrepancy_L": np.float64(rng.normal(0, 100)),
+            "flagged_tickets_count": len(flagged),
+            "unlogged_drains_count": len(unlogged),
+            "flagged_tickets": flagged,
+            "unlogged_drains": unlogged,
+            "reconciled_pairs": pairs,
+        })
+    return days
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from fastapi.encoders import jsonable_encoder
+
+    # The old path: convert Timestamps, then let FastAPI walk it again
+    def serialize_item(item):
+        if isinstance(item, pd.Timestamp):
+            return item.isoformat()
+        elif isinstance(item, list):
+            return [serialize_item(i) for i in item]
+        elif isinstance(item, dict):
+            return {k: serialize_item(v) for k, v in item.items()}
+        else:
+            return item
+
+    n_days = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    days = _sample_days(n_days)
+
+    def old_path():
+        content = jsonable_encoder([serialize_item(day) for day in days])
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def best_of(fn, repeat=5):
+        best = float("inf")
+        for _ in range(repeat):
+            t = time.perf_counter()
+            body = fn()
+            best = min(best, time.perf_counter() - t)
+        return best, body
+
+    old_time, old_body = best_of(old_path)
+    new_time, new_body = best_of(lambda: dumps(days))
+    assert json.loads(old_body) == json.loads(new_body)
+
+    print(f"Encoding {n_days} days ({len(new_body) / 2**20:.1f} MiB, {'orjson' if orjson else 'json'}):")
+    print(f"  serialize_item + jsonable_encoder + json.dumps: {old_time * 1000:.1f} ms")
+    print(f"  result_encoder.dumps:                           {new_time * 1000:.1f} ms ({old_time / new_time:.1f}x)")
@@ -0,0 +1,136 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+
+def reference_day_index(df, column):
+    # The original build_day_index: compares floored Timestamps
+    day_start = df[column].dt.floor('D').to_numpy()
+    starts = np.flatnonzero(np.r_[True, day_start[1:] != day_start[:-1]])
+    ends = np.r_[starts[1:], len(df)]
+    days = df[column].iloc[starts].dt.date
+    return {day: slice(start, end) for day, start, end in zip(days, starts, ends)}
+
+@pytest.mark.parametrize("tz", [None, "UTC", "America/Chicago"])
+def test_day_index_matches_floor_across_midnight(tz):
+    # Every 7 minutes for 3 days, starting an hour before midnight (and
+    # crossing a DST change in Chicago)
+    timestamps = pd.date_range("2025-11-01 23:00", periods=3 * 1440 // 7, freq="7min", tz=tz)
+    df = pd.DataFrame({"timestamp": timestamps, "volume": np.arange(len(timestamps), dtype=np.float32)})
+
+    index = analysis.build_day_index(df, "timestamp")
+    assert index == reference_day_index(df, "timestamp")
+    assert len(index) == 4
+
+def test_day_index_of_empty_frame():
+    df = pd.DataFrame({"timestamp": pd.to_datetime([], utc=True)})
+    assert analysis.build_day_index(df, "timestamp") == {}
+
+def synthetic_levels(n_minutes=3 * 1440, cauldron_ids=("cauldron_001", "cauldron_002", "cauldron_003"), seed=0):
+    # Filling cauldrons with random drains (some running past midnight),
+    # time-sorted like the server's levels
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2025-11-01 20:00", periods=n_minutes, freq="min", tz="UTC")
+    frames = []
+    for cauldron_id in cauldron_ids:
+        delta = np.full(n_minutes, rng.uniform(0.5, 1.5)) + rng.normal(0, 0.05, n_minutes)
+        for start in rng.integers(0, n_minutes, n_minutes // 300):
+            delta[start:start + rng.integers(5, 90)] -= rng.uniform(3, 10)
+        frames.append(pd.DataFrame({"timestamp": timestamps, "cauldron_id": cauldron_id,
+                                    "volume": (500 + np.cumsum(delta)).astype(np.float32)}))
+    levels = pd.concat(frames).sort_values("timestamp", kind="stable", ignore_index=True)
+    levels["cauldron_id"] = levels["cauldron_id"].astype("category")
+    return levels
+
+@pytest.mark.parametrize("seed", range(5))
+def test_extending_indexes_and_drain_events_matches_a_full_build(seed):
+    levels, fill_rates = analysis.add_analysis_columns(synthetic_levels(seed=seed))
+    full_events = analysis.build_drain_event_table(levels, fill_rates)
+
+    rng = np.random.default_rng(seed)
+    for old_rows in sorted(rng.integers(1, len(levels), 8)):
+        old_index = analysis.build_day_index(levels.iloc[:old_rows], "timestamp")
+        old_events = analysis.build_drain_event_table(levels.iloc[:old_rows], fill_rates)
+
+        index = analysis.extend_day_index(old_index, levels, "timestamp", old_rows)
+        events, changed_days = analysis.extend_drain_event_table(old_events, levels, fill_rates, old_index, old_rows)
+
+        assert index == analysis.build_day_index(levels, "timestamp")
+        pd.testing.assert_frame_equal(events, full_events)
+        # Every event that differs from the old table starts on a reported day
+        merged = full_events.merge(old_events, how="outer", indicator=True)
+        assert set(merged.loc[merged["_merge"] != "both", "start_time"].dt.date) <= changed_days
+
+def test_extending_drain_events_with_a_new_cauldron():
+    levels = synthetic_levels(cauldron_ids=("cauldron_001", "cauldron_002", "cauldron_004"), seed=7)
+    late = (levels["cauldron_id"] == "cauldron_004") & (levels["timestamp"] < levels["timestamp"].iloc[len(levels) // 2])
+    levels, fill_rates = analysis.add_analysis_columns(levels[~late].reset_index(drop=True))
+
+    old_rows = len(levels) // 2 - 100  # before cauldron_004's first reading
+    old_index = analysis.build_day_index(levels.iloc[:old_rows], "timestamp")
+    old_events = analysis.build_drain_event_table(levels.iloc[:old_rows], fill_rates)
+    events, _ = analysis.extend_drain_event_table(old_events, levels, fill_rates, old_index, old_rows)
+    pd.testing.assert_frame_equal(events, analysis.build_drain_event_table(levels, fill_rates))
+
+def test_optimal_mode_without_scipy_is_a_clear_error(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    # A None entry in sys.modules makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, "scipy.optimize", None)
+    assert not analysis.optimal_mode_available()
+
+    response = TestClient(analysis.app).post("/query_days", json={"days": ["2025-10-30"], "mode": "optimal"})
+    assert response.status_code == 501
+    assert "scipy" in response.json()["detail"]
+
+def reference_reconcile(drain_events_list, tickets_today_list):
+    # The original best-fit: a linear scan over the remaining tickets
+    unlogged_drains, reconciled_pairs = [], []
+    tickets_to_match = list(tickets_today_list)
+    for event in drain_events_list:
+        best_match_ticket, smallest_diff_percent, ticket_index_to_remove = None, float('inf'), -1
+        for i, ticket in enumerate(tickets_to_match):
+            if event['cauldron_id'] == ticket['cauldron_id']:
+                if ticket['amount_collected'] > 0:
+                    diff_percent = abs(event['total_drain'] - ticket['amount_collected']) / ticket['amount_collected']
+                else:
+                    diff_percent = float('inf')
+                if diff_percent < smallest_diff_percent:
+                    smallest_diff_percent, best_match_ticket, ticket_index_to_remove = diff_percent, ticket, i
+        if best_match_ticket is not None and smallest_diff_percent <= analysis.MATCH_TOLERANCE:
+            reconciled_pairs.append({"ticket": best_match_ticket, "event": event})
+            tickets_to_match.pop(ticket_index_to_remove)
+        else:
+            unlogged_drains.append(event)
+    return tickets_to_match, unlogged_drains, reconciled_pairs
+
+@pytest.mark.parametrize("seed", range(200))
+def test_ticket_buckets_match_the_linear_scan(seed):
+    rng = np.random.default_rng(seed)
+    cauldron_ids = [f"cauldron_{i:03d}" for i in range(1, rng.integers(1, 5) + 1)]
+    # Coarse amounts so there are plenty of equal amounts (ties) and 0L tickets
+    step = rng.choice([0.5, 5.0, 25.0])
+    tickets = [
+        {
+            "ticket_id": f"TT_{j:04d}",
+            "cauldron_id": str(rng.choice(cauldron_ids)),
+            "amount_collected": float(np.round(rng.uniform(0, 300) / step) * step),
+        }
+        for j in range(rng.integers(0, 40))
+    ]
+    events = []
+    for _ in range(rng.integers(0, 40)):
+        if tickets and rng.random() < 0.7:
+            # Near (or exactly at) some ticket's amount
+            ticket = tickets[rng.integers(len(tickets))]
+            drain = ticket["amount_collected"] * float(rng.choice([1.0, rng.uniform(0.9, 1.1)]))
+            cauldron_id = ticket["cauldron_id"]
+        else:
+            drain = float(rng.uniform(0, 300))
+            cauldron_id = str(rng.choice(cauldron_ids + ["cauldron_999"]))
+        events.append({"cauldron_id": cauldron_id, "total_drain": drain})
+
+    assert analysis.reconcile_events_and_tickets(events, tickets) == reference_reconcile(events, tickets)
@@ -0,0 +1,54 @@
+import json
+import random
+
+import pytest
+
+import api_loader
+
+def random_value(rng, depth=0):
+    kind = rng.choice(["int", "float", "string", "literal", "list", "dict"] if depth < 3 else ["int", "float", "string", "literal"])
+    if kind == "int":
+        return rng.randint(-10**12, 10**12)
+    if kind == "float":
+        return rng.choice([rng.uniform(-1e3, 1e3), rng.uniform(-1, 1) * 10.0 ** rng.randint(-30, 30), 0.0, -0.5])
+    if kind == "string":
+        # Escapes and multi-byte characters, so chunks split inside them
+        return "".join(rng.choice(['a', 'Z', ' ', ',', ']', '[', '"', '\\', '\n', 'é', '€', '🧪', ' ']) for _ in range(rng.randint(0, 12)))
+    if kind == "literal":
+        return rng.choice([True, False, None])
+    if kind == "list":
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"key_{i}": random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+def random_chunks(body: bytes, rng) -> list:
+    # Random cut points, anywhere (mid-number, mid-escape, mid-character)
+    cuts = sorted(rng.sample(range(1, len(body)), min(len(body) - 1, rng.randint(0, 30)))) if len(body) > 1 else []
+    return [body[start:end] for start, end in zip([0] + cuts, cuts + [len(body)])]
+
+@pytest.mark.parametrize("seed", range(300))
+def test_iter_json_array_matches_json_loads(seed):
+    rng = random.Random(seed)
+    values = [random_value(rng) for _ in range(rng.randint(0, 20))]
+    body = json.dumps(
+        values,
+        ensure_ascii=rng.random() < 0.5,
+        indent=rng.choice([None, 2]),
+        separators=rng.choice([None, (",", ":"), (" , ", " : ")]),
+    ).encode("utf-8")
+
+    chunks = random_chunks(body, rng)
+    assert list(api_loader.iter_json_array(chunks)) == json.loads(body)
+
+def test_iter_json_array_one_byte_at_a_time():
+    body = b' [ 12, 12.5e3 , -0.25,"\xe2\x82\xac" ,{"a": [1, 2]}, null ] '
+    chunks = [body[i:i + 1] for i in range(len(body))]
+    assert list(api_loader.iter_json_array(chunks)) == json.loads(body)
+
+@pytest.mark.parametrize("body", [b'[1, 2', b'[{"a": 1}, {"b"', b'[12.5', b''])
+def test_iter_json_array_rejects_truncated_arrays(body):
+    with pytest.raises(ValueError):
+        list(api_loader.iter_json_array([body]))
+
+def test_iter_json_array_rejects_non_arrays():
+    with pytest.raises(ValueError):
+        list(api_loader.iter_json_array([b'{"a": 1}']))
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import fill_rate_sketch
+
+def random_deltas(seed, n_days=12, cauldron_ids=("cauldron_001", "cauldron_002", "cauldron_003")):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(200, 2000))
+    start = pd.Timestamp("2025-10-01", tz="UTC")
+    minutes = np.sort(rng.integers(0, n_days * 1440, n))
+    cauldron = rng.choice(len(cauldron_ids), n)
+    # Filling rates over several orders of magnitude, draining minutes, and
+    # a cauldron that stops filling partway through
+    delta = np.exp(rng.normal(0, 3, n)) * np.where(rng.random(n) < 0.7, 1, -1)
+    delta[(cauldron == 2) & (minutes > n_days * 1440 // 2)] = -1.0
+    return pd.DataFrame({
+        'timestamp': start + pd.to_timedelta(minutes, unit='min'),
+        'cauldron_id': pd.Categorical.from_codes(cauldron, categories=list(cauldron_ids)),
+        'observed_delta': delta,
+    })
+
+def exact_rolling_fill_rates(df, window, fallback, first_day, last_day):
+    # The exact lower median of each window's positive deltas
+    days = fill_rate_sketch.day_numbers(df['timestamp'])
+    delta = np.clip(df['observed_delta'].to_numpy(), fill_rate_sketch.MIN_RATE, fill_rate_sketch.MAX_RATE)
+    filling = df['observed_delta'].to_numpy() > 0
+    cauldron_ids = df['cauldron_id'].astype(str).to_numpy()
+    rates = {}
+    for cauldron_id in sorted(set(fallback.index) | set(cauldron_ids[filling])):
+        for day in range(first_day, last_day + 1):
+            in_window = filling & (cauldron_ids == cauldron_id) & (days > day - window) & (days <= day)
+            values = np.sort(delta[in_window])
+            rates[(day, cauldron_id)] = values[(len(values) - 1) // 2] if len(values) else fallback.get(cauldron_id, 0.0)
+    return rates
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("window", [1, 3, 7])
+def test_rolling_fill_rates_are_within_the_sketch_accuracy(seed, window):
+    df = random_deltas(seed)
+    fallback = pd.Series({"cauldron_001": 1.5, "cauldron_002": 2.5, "cauldron_003": 3.5, "cauldron_004": 4.5})
+    first_day, last_day = fill_rate_sketch.day_numbers(df['timestamp'].iloc[[0, -1]])
+
+    grid = fill_rate_sketch.rolling_fill_rates(fill_rate_sketch.build_sketches(df), window, fallback, first_day, last_day)
+    exact = exact_rolling_fill_rates(df, window, fallback, first_day, last_day)
+
+    assert {(day, cauldron_id) for day in grid.index for cauldron_id in grid.columns} == set(exact)
+    for (day, cauldron_id), rate in exact.items():
+        assert grid.at[day, cauldron_id] == pytest.approx(rate, rel=fill_rate_sketch.RELATIVE_ACCURACY * (1 + 1e-9))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_updated_sketches_match_a_full_build(seed):
+    df = random_deltas(seed)
+    split = int(np.random.default_rng(seed).integers(1, len(df)))
+
+    updated = fill_rate_sketch.update_sketches(fill_rate_sketch.build_sketches(df.iloc[:split]), df)
+    pd.testing.assert_frame_equal(updated, fill_rate_sketch.build_sketches(df))
@@ -0,0 +1,41 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import result_encoder
+
+def sample_with_nan():
+    return [{
+        "date": pd.Timestamp("2025-01-01", tz="UTC").date(),
+        "total_discrepancy_L": float("nan"),
+        "rates": [1.5, float("inf"), -float("inf"), np.float64("nan")],
+        "drain": np.float32("nan"),
+        "levels": np.array([1.0, np.nan, 2.5]),
+        "event": {"start_time": pd.Timestamp("2025-01-01 12:00", tz="UTC"), "total_drain": np.float64(3.25)},
+        "count": np.int64(4),
+        "pair": (1, float("nan")),
+    }]
+
+EXPECTED = [{
+    "date": "2025-01-01",
+    "total_discrepancy_L": None,
+    "rates": [1.5, None, None, None],
+    "drain": None,
+    "levels": [1.0, None, 2.5],
+    "event": {"start_time": "2025-01-01T12:00:00+00:00", "total_drain": 3.25},
+    "count": 4,
+    "pair": [1, None],
+}]
+
+def test_fallback_encodes_non_finite_floats_as_null(monkeypatch):
+    monkeypatch.setattr(result_encoder, "orjson", None)
+    body = result_encoder.dumps(sample_with_nan())
+    assert json.loads(body) == EXPECTED
+
+def test_orjson_and_fallback_give_identical_output(monkeypatch):
+    pytest.importorskip("orjson")
+    fast = result_encoder.dumps(sample_with_nan())
+    monkeypatch.setattr(result_encoder, "orjson", None)
+    assert result_encoder.dumps(sample_with_nan()) == fast